@@ -0,0 +1,81 @@
+"""
+Benchmark ConnectionParser lookups on a synthetic module with thousands of classes.
+
+Compares the inverted method/attribute indexes against the previous linear scan
+over every class. Run from the repository root:
+
+    python -m benchmarks.bench_connection_parser --classes 2000
+"""
+import argparse
+import ast
+import time
+
+from utils.connection_parser import ConnectionParser
+from utils.python_code_parser import PythonCodeVisitor
+
+
+class LinearConnectionParser(ConnectionParser):
+    """ConnectionParser with the original per-lookup scan over all classes."""
+
+    def _refine_guess_from_method(self, var_name: str, method_attr: str):
+        method_str = method_attr + "()"
+        candidate_classes = []
+        for cls in self.class_to_methods.keys():
+            if method_str in self.class_to_methods[cls]:
+                candidate_classes.append(cls)
+        self._add_to_connections(candidate_classes)
+
+    def _refine_guess_from_attribute(self, var_name: str, attribute_name: str):
+        candidate_classes = []
+        for cls, attr_list in self.class_to_attrs.items():
+            if attribute_name in attr_list:
+                candidate_classes.append(cls)
+        self._add_to_connections(candidate_classes)
+
+
+def generate_module(num_classes: int, methods_per_class: int) -> str:
+    """Generate classes whose methods call methods and read attributes of other classes."""
+    lines = []
+    for i in range(num_classes):
+        other = (i + 1) % num_classes
+        lines.append(f"class Class{i}:")
+        lines.append("    def __init__(self):")
+        lines.append(f"        self.attr_{i} = {i}")
+        for j in range(methods_per_class):
+            lines.append(f"    def method_{i}_{j}(self, peer):")
+            lines.append(f"        peer.method_{other}_{j}()")
+            lines.append(f"        return peer.attr_{other}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def time_parser(parser_class, tree, classes, class_to_methods, class_to_attributes) -> tuple:
+    start = time.perf_counter()
+    parser = parser_class(classes, class_to_methods, class_to_attributes)
+    parser.visit(tree)
+    return time.perf_counter() - start, parser.connections
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--classes', type=int, default=2000)
+    arg_parser.add_argument('--methods', type=int, default=5, help='Methods per class.')
+    args = arg_parser.parse_args()
+
+    tree = ast.parse(generate_module(args.classes, args.methods))
+    code_visitor = PythonCodeVisitor()
+    code_visitor.visit(tree)
+    classes, class_to_methods, class_to_attributes = code_visitor.get_results()
+
+    linear_time, linear_connections = time_parser(LinearConnectionParser, tree, classes, class_to_methods, class_to_attributes)
+    indexed_time, indexed_connections = time_parser(ConnectionParser, tree, classes, class_to_methods, class_to_attributes)
+    assert linear_connections == indexed_connections, "Indexed lookups changed the inferred connections."
+
+    print(f"Classes: {args.classes}, methods per class: {args.methods}, connections: {len(indexed_connections)}")
+    print(f"Linear scan:     {linear_time * 1000:10.1f} ms")
+    print(f"Inverted index:  {indexed_time * 1000:10.1f} ms")
+    print(f"Speedup:         {linear_time / indexed_time:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Scaling benchmark for DiagramVisitor on large generated diagrams.
+
+Generates diagrams with an increasing number of containers and edges and reports
+the visit time per edge, which should stay flat as the diagram grows. Run from the
+repository root:
+
+    python -m benchmarks.bench_diagram_parser --edges 10000
+"""
+import argparse
+import ast
+import time
+
+from utils.diagram_parser import DiagramVisitor
+
+
+def generate_diagram(num_edges: int, edges_per_class: int = 5) -> str:
+    """Generate a diagrams-library file with `num_edges` labelled edges."""
+    num_classes = max(2, num_edges // edges_per_class)
+    lines = [
+        "from diagrams import Diagram, Edge",
+        "from diagrams.c4 import Container",
+        "",
+        "with Diagram(\"generated\", show=False):",
+    ]
+    for i in range(num_classes):
+        lines.append(f"    class{i} = Container(\"Class{i}\")")
+    lines.append(f"    group = [{', '.join(f'class{i}' for i in range(min(num_classes, 50)))}]")
+
+    for edge in range(num_edges):
+        source = edge % num_classes
+        target = (edge * 7 + 1) % num_classes
+        method = f"method_{edge}()"
+        if edge % 10 == 0:
+            lines.append(f"    class{source} >> Edge(label=\"{method}\", style='dashed', color='blue') >> class{source}")
+        elif edge % 10 == 1:
+            lines.append(f"    class{source} >> Edge(label=\"{method}\", style='dotted', color='black') >> group")
+        else:
+            lines.append(f"    class{source} >> Edge(label=\"{method}\", style='solid', color='red') >> class{target}")
+    return "\n".join(lines) + "\n"
+
+
+def time_visit(source: str) -> float:
+    tree = ast.parse(source)
+    start = time.perf_counter()
+    visitor = DiagramVisitor()
+    visitor.visit(tree)
+    visitor.get_results()
+    return time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--edges', type=int, default=10000, help='Edges in the largest diagram.')
+    arg_parser.add_argument('--steps', type=int, default=4, help='Number of diagram sizes to time.')
+    args = arg_parser.parse_args()
+
+    print(f"{'edges':>8} {'total ms':>10} {'us/edge':>9}")
+    for step in range(1, args.steps + 1):
+        num_edges = args.edges * step // args.steps
+        elapsed = time_visit(generate_diagram(num_edges))
+        print(f"{num_edges:>8} {elapsed * 1000:>10.1f} {elapsed * 1e6 / num_edges:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+"""
+Stage-level benchmark suite for the parsers, the comparison and diagram generation.
+
+Generates a Python module, a PHP file and a matching diagram of the requested size
+(see benchmarks/synthetic.py), times every stage on them and prints the median
+and minimum of each. PHP stages run only when `php` is installed. Run from the
+repository root:
+
+    python -m benchmarks.bench_suite --classes 500 --output results.json
+    python -m benchmarks.bench_suite --classes 500 --compare results.json
+"""
+import argparse
+import ast
+import contextlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import generate_diagram, generate_php, generate_python
+from diagram_code_auditor import audit_pair, compare_methods
+from diagram_creator import write_diagram
+from utils.connection_parser import ConnectionParser
+from utils.diagram_emitters import dot_source, mermaid_source, plantuml_source
+from utils.diagram_parser import DiagramVisitor
+from utils.diagram_readers import read_dot, read_mermaid, read_plantuml
+from utils.parse_cache import KINDS, TOOL_VERSION, configure_cache, get_cache
+from utils.php_code_parser import extract_php_data, php_worker_session
+from utils.python_code_parser import PythonCodeVisitor
+
+
+@contextlib.contextmanager
+def silenced_output():
+    """Discard everything written to stdout/stderr, including by subprocesses such as the diagram render."""
+    sys.stdout.flush()
+    sys.stderr.flush()
+    saved = os.dup(1), os.dup(2)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    try:
+        os.dup2(devnull, 1)
+        os.dup2(devnull, 2)
+        yield
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os.dup2(saved[0], 1)
+        os.dup2(saved[1], 2)
+        for fd in (*saved, devnull):
+            os.close(fd)
+
+
+def time_stage(function, repeat: int) -> dict:
+    """Run `function` `repeat` times and summarize the wall times in milliseconds."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'runs': repeat,
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'mean_ms': round(statistics.fmean(timings), 3),
+    }
+
+
+def visit_python(tree):
+    visitor = PythonCodeVisitor()
+    visitor.visit(tree)
+    return visitor.get_results()
+
+
+def visit_diagram(tree):
+    visitor = DiagramVisitor()
+    visitor.visit(tree)
+    return visitor.get_results()
+
+
+def find_connections(tree, classes, class_to_methods, class_to_attributes):
+    parser = ConnectionParser(classes, class_to_methods, class_to_attributes)
+    parser.visit(tree)
+    return parser.connections
+
+
+def run_suite(args, work_dir: str) -> dict:
+    size = (args.classes, args.methods, args.depth, args.fan_out)
+    python_source = generate_python(*size)
+    diagram_source = generate_diagram(*size)
+
+    python_path = os.path.join(work_dir, 'generated.py')
+    diagram_path = os.path.join(work_dir, 'generated_diagram.py')
+    for path, source in ((python_path, python_source), (diagram_path, diagram_source)):
+        with open(path, 'w') as f:
+            f.write(source)
+
+    python_tree = ast.parse(python_source)
+    diagram_tree = ast.parse(diagram_source)
+    classes, class_to_methods, class_to_attributes = visit_python(python_tree)
+    _, diagram_class_to_methods, _, _ = visit_diagram(diagram_tree)
+    connections = find_connections(python_tree, classes, class_to_methods, class_to_attributes)
+
+    stages = {}
+
+    def stage(name, function, quiet=False):
+        with silenced_output() if quiet else contextlib.nullcontext():
+            stages[name] = time_stage(function, args.repeat)
+        print(f"{name:<28} {stages[name]['median_ms']:>12.2f} {stages[name]['min_ms']:>12.2f}")
+
+    print(f"{'stage':<28} {'median ms':>12} {'min ms':>12}")
+    stage('ast_parse_python', lambda: ast.parse(python_source))
+    stage('python_code_visitor', lambda: visit_python(python_tree))
+    stage('connection_parser', lambda: find_connections(python_tree, classes, class_to_methods, class_to_attributes))
+    stage('ast_parse_diagram', lambda: ast.parse(diagram_source))
+    stage('diagram_visitor', lambda: visit_diagram(diagram_tree))
+    stage('compare_methods', lambda: compare_methods(class_to_methods, diagram_class_to_methods))
+
+    # From here on the parse and render caches are off: every run parses and renders from scratch.
+    configure_cache(enabled=False)
+
+    written_path = os.path.join(work_dir, 'diagram_for_generated.py')
+    stage('write_diagram_source', lambda: write_diagram(written_path, 'generated', classes, class_to_methods, connections, render=False))
+    stage('write_diagram', lambda: write_diagram(written_path, 'generated', classes, class_to_methods, connections), quiet=True)
+    stage('dot_source', lambda: dot_source('generated', classes, class_to_methods, connections))
+    stage('mermaid_source', lambda: mermaid_source('generated', classes, class_to_methods, connections))
+    stage('plantuml_source', lambda: plantuml_source('generated', classes, class_to_methods, connections))
+
+    # Hand-written text diagrams often end in indented blank lines and comments, which the
+    # readers must skip in one pass (a backtracking DOT tokenizer took seconds on a few of them).
+    # The PlantUML text also opens with a floating note, which must not hide the classes after
+    # it, and ends in a long dotted line, on which a backtracking relation pattern was quadratic.
+    trailer = '    \n' * 20 + '\n'
+    plantuml_text = plantuml_source('generated', classes, class_to_methods, connections)
+    plantuml_text = plantuml_text.replace('\n', '\nnote "generated" as N1\n', 1) + 'a.' * 20000 + '\n' + trailer
+    texts = (
+        ('read_dot', read_dot, dot_source('generated', classes, class_to_methods, connections) + trailer + '// end\n  '),
+        ('read_mermaid', read_mermaid, mermaid_source('generated', classes, class_to_methods, connections) + trailer),
+        ('read_plantuml', read_plantuml, plantuml_text),
+    )
+    for name, reader, text in texts:
+        if set(reader(text)[0]) != set(classes):
+            raise RuntimeError(f"{name} did not read back the generated classes")
+        stage(name, lambda reader=reader, text=text: reader(text))
+
+    with silenced_output():
+        result = audit_pair(python_path, diagram_path)
+    if result['error']:
+        raise RuntimeError(f"Generated Python audit failed: {result['error']}")
+    stage('audit_python_end_to_end', lambda: audit_pair(python_path, diagram_path), quiet=True)
+
+    if shutil.which('php'):
+        php_path = os.path.join(work_dir, 'generated.php')
+        with open(php_path, 'w') as f:
+            f.write(generate_php(*size))
+        stage('extract_php_data', lambda: extract_php_data(php_path))
+        with php_worker_session():
+            stage('extract_php_data_worker', lambda: extract_php_data(php_path))
+        stage('audit_php_end_to_end', lambda: audit_pair(php_path, diagram_path), quiet=True)
+    else:
+        print("php not found: skipping PHP stages.")
+
+    # The same audit once every model is in the parse cache.
+    configure_cache(enabled=True, cache_dir=os.path.join(work_dir, 'cache'))
+    audit_pair(python_path, diagram_path)
+    stage('audit_python_cached', lambda: audit_pair(python_path, diagram_path))
+
+    # diagram-audit --invalidate must drop the code file's entries but keep the diagram's.
+    cache = get_cache()
+    with open(python_path, 'rb') as f:
+        python_content = f.read()
+    with open(diagram_path, 'rb') as f:
+        diagram_content = f.read()
+    cache.invalidate(python_path)
+    if any(cache.get(kind, python_content) for kind in KINDS):
+        raise RuntimeError("ParseCache.invalidate left entries for the invalidated file")
+    if not any(cache.get(kind, diagram_content) for kind in KINDS):
+        raise RuntimeError("ParseCache.invalidate dropped the entries of another file")
+
+    def audit_invalidated():
+        cache.invalidate(python_path)
+        return audit_pair(python_path, diagram_path)
+
+    stage('audit_python_invalidated', audit_invalidated)
+
+    return stages
+
+
+def compare_to_baseline(stages: dict, baseline_file: str) -> None:
+    """Print the median of every stage relative to a previous run's JSON output."""
+    with open(baseline_file) as f:
+        baseline = json.load(f)['stages']
+
+    print(f"\n{'stage':<28} {'baseline ms':>12} {'current ms':>12} {'ratio':>8}")
+    for name, result in stages.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]['median_ms']
+        ratio = result['median_ms'] / before if before else float('inf')
+        print(f"{name:<28} {before:>12.2f} {result['median_ms']:>12.2f} {ratio:>7.2f}x")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--classes', type=int, default=200)
+    arg_parser.add_argument('--methods', type=int, default=5, help='Own methods per class.')
+    arg_parser.add_argument('--depth', type=int, default=3, help='Length of inheritance chains (1 = no inheritance).')
+    arg_parser.add_argument('--fan-out', type=int, default=2, help='Classes called by every method.')
+    arg_parser.add_argument('--repeat', type=int, default=5, help='Timed runs per stage.')
+    arg_parser.add_argument('--output', metavar='FILE', help='Write the results as JSON.')
+    arg_parser.add_argument('--compare', metavar='FILE', help='Compare with the JSON results of an earlier run.')
+    args = arg_parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='diagram_audit_bench_')
+    try:
+        stages = run_suite(args, work_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'tool_version': TOOL_VERSION,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'php': bool(shutil.which('php')),
+            'parameters': {
+                'classes': args.classes,
+                'methods': args.methods,
+                'depth': args.depth,
+                'fan_out': args.fan_out,
+                'repeat': args.repeat,
+            },
+        },
+        'stages': stages,
+    }
+
+    if args.compare:
+        compare_to_baseline(stages, args.compare)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
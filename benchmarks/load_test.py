@@ -0,0 +1,315 @@
+"""
+Repository-scale load test for the audit and creator pipelines.
+
+Generates a fake repository with thousands of code files, one diagram per code
+file and a matching code_diagram_mapping.json (see benchmarks/synthetic.py), then
+runs each pipeline in a fresh child process and reports its wall time, per-file
+latency percentiles (the time spent on each file, measured where it is processed),
+peak RSS and the number of processes it started. Run from the repository root:
+
+    python -m benchmarks.load_test --files 10000 --save-baseline load_baseline.json
+    python -m benchmarks.load_test --files 10000 --baseline load_baseline.json
+
+With --baseline, the exit status is 1 if any metric regressed past the baseline
+by more than --tolerance.
+"""
+import argparse
+import json
+import multiprocessing.process
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.synthetic import generate_diagram, generate_php, generate_python
+
+TOOL_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FILES_PER_PACKAGE = 500
+
+# Metrics compared against a baseline; lower is better for all of them.
+CHECKED_METRICS = ('wall_s', 'latency_p95_ms', 'peak_rss_mb', 'subprocesses', 'worker_processes')
+
+
+def generate_repository(repo_dir: str, args) -> None:
+    """Write the code files, their diagrams and code_diagram_mapping.json under `repo_dir`."""
+    size = (args.classes, args.methods, args.depth, args.fan_out)
+    php_every = round(1 / args.php_ratio) if args.php_ratio else 0
+    mapping = {}
+
+    for i in range(args.files):
+        package = f"pkg_{i // FILES_PER_PACKAGE}"
+        os.makedirs(os.path.join(repo_dir, package, 'diagrams'), exist_ok=True)
+        prefix = f"M{i}_"
+        is_php = php_every and i % php_every == 0
+
+        code_path = os.path.join(package, f"module_{i}.{'php' if is_php else 'py'}")
+        diagram_path = os.path.join(package, 'diagrams', f"module_{i}_diagram.py")
+        source = generate_php(*size, prefix=prefix) if is_php else generate_python(*size, prefix=prefix)
+        with open(os.path.join(repo_dir, code_path), 'w') as f:
+            f.write(source)
+        with open(os.path.join(repo_dir, diagram_path), 'w') as f:
+            f.write(generate_diagram(*size, prefix=prefix))
+        mapping[code_path] = diagram_path
+
+    with open(os.path.join(repo_dir, 'code_diagram_mapping.json'), 'w') as f:
+        json.dump(mapping, f, indent=2)
+
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+class ProcessCounter:
+    """
+    Count subprocess.Popen and multiprocessing starts in this process and in every
+    process forked from it, by appending one byte per start to a shared file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def install(self) -> None:
+        counter = self
+
+        original_popen_init = subprocess.Popen.__init__
+        def popen_init(popen, *args, **kwargs):
+            counter.record(b's')
+            original_popen_init(popen, *args, **kwargs)
+        subprocess.Popen.__init__ = popen_init
+
+        original_start = multiprocessing.process.BaseProcess.start
+        def start(process):
+            counter.record(b'w')
+            original_start(process)
+        multiprocessing.process.BaseProcess.start = start
+
+    def record(self, kind: bytes) -> None:
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT)
+        try:
+            os.write(fd, kind)
+        finally:
+            os.close(fd)
+
+    def counts(self) -> tuple:
+        """(subprocesses, worker_processes) started so far."""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return 0, 0
+        return data.count(b's'), data.count(b'w')
+
+
+def run_audit_stage(args) -> list:
+    """
+    Audit every mapped pair, returning the milliseconds spent loading each code and diagram file.
+
+    Results from a process pool arrive in chunks, so the gaps between them say nothing
+    about single files; the `load code` / `load diagram` spans of --trace are timed
+    where the file is parsed, in the worker, and travel back with its model.
+    """
+    from diagram_code_auditor import run_batch
+    from utils.mapping import load_mapping
+    from utils.tracing import collect_events, enable_tracing
+
+    enable_tracing()
+    for result in run_batch(load_mapping('code_diagram_mapping.json'), args.jobs):
+        if result['error']:
+            raise RuntimeError(result['error'])
+    return [event['dur'] / 1000 for event in collect_events() if event['cat'] == 'file' and event['name'].startswith('load ')]
+
+
+def run_creator_stage(args) -> list:
+    """Generate a diagram for the first --creator-files code files, returning the milliseconds each one took."""
+    from diagram_creator import extract_code_model, write_diagram
+    from utils.mapping import load_mapping
+
+    code_files = [code_file for code_files, _ in load_mapping('code_diagram_mapping.json') for code_file in code_files]
+    os.makedirs('created', exist_ok=True)
+    latencies = []
+    for code_file in code_files[:args.creator_files]:
+        start = time.perf_counter()
+        classes, class_to_methods, _, connections = extract_code_model(code_file)
+        diagram_path = os.path.join('created', 'diagram_for_' + os.path.basename(code_file))
+        write_diagram(diagram_path, code_file, classes, class_to_methods, connections)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+STAGES = {'audit': run_audit_stage, 'creator': run_creator_stage}
+
+
+def run_stage_in_this_process(args) -> None:
+    """Entry point of the child process that runs one pipeline; writes its metrics to --result."""
+    from utils.parse_cache import configure_cache
+
+    counter = ProcessCounter(args.result + '.processes')
+    counter.install()
+    configure_cache(enabled=False)
+
+    # The pipelines print per-file output; keep only our own report.
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.dup2(devnull, 2)
+
+    start = time.perf_counter()
+    latencies = STAGES[args.stage](args)
+    wall = time.perf_counter() - start
+    latencies.sort()
+
+    subprocesses, worker_processes = counter.counts()
+    # ru_maxrss is in KiB on Linux and bytes on macOS; RUSAGE_CHILDREN covers the largest waited-for child.
+    scale = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    peak_rss = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    ) / scale
+
+    metrics = {
+        'files': len(latencies),
+        'wall_s': round(wall, 3),
+        'latency_p50_ms': round(percentile(latencies, 0.50), 3),
+        'latency_p90_ms': round(percentile(latencies, 0.90), 3),
+        'latency_p95_ms': round(percentile(latencies, 0.95), 3),
+        'latency_p99_ms': round(percentile(latencies, 0.99), 3),
+        'latency_max_ms': round(latencies[-1] if latencies else 0.0, 3),
+        'peak_rss_mb': round(peak_rss, 1),
+        'subprocesses': subprocesses,
+        'worker_processes': worker_processes,
+    }
+    with open(args.result, 'w') as f:
+        json.dump(metrics, f)
+
+
+def run_stage(stage: str, repo_dir: str, args) -> dict:
+    """Run one pipeline in a fresh interpreter inside the generated repository."""
+    result_file = os.path.join(repo_dir, f".{stage}_metrics.json")
+    command = [
+        sys.executable, '-m', 'benchmarks.load_test',
+        '--stage', stage, '--result', result_file,
+        '--creator-files', str(args.creator_files),
+    ]
+    if args.jobs is not None:
+        command += ['--jobs', str(args.jobs)]
+
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [TOOL_ROOT, os.environ.get('PYTHONPATH')])))
+    completed = subprocess.run(command, cwd=repo_dir, env=env)
+    if completed.returncode != 0:
+        raise RuntimeError(f"The {stage} stage exited with status {completed.returncode}.")
+    with open(result_file) as f:
+        return json.load(f)
+
+
+def print_metrics(results: dict) -> None:
+    columns = ('files', 'wall_s', 'latency_p50_ms', 'latency_p95_ms', 'latency_p99_ms', 'peak_rss_mb', 'subprocesses', 'worker_processes')
+    print(f"{'stage':<10}" + "".join(f"{column:>18}" for column in columns))
+    for stage, metrics in results.items():
+        print(f"{stage:<10}" + "".join(f"{metrics[column]:>18}" for column in columns))
+
+
+def find_regressions(results: dict, baseline: dict, tolerance: float) -> list:
+    """Describe every checked metric that exceeds its baseline value by more than `tolerance`."""
+    regressions = []
+    for stage, metrics in results.items():
+        for metric in CHECKED_METRICS:
+            before = baseline.get(stage, {}).get(metric)
+            if before is None:
+                continue
+            if metrics[metric] > before * (1 + tolerance):
+                regressions.append(f"{stage}.{metric}: {metrics[metric]} > baseline {before} (+{tolerance:.0%} allowed)")
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--files', type=int, default=10000, help='Code files in the generated repository.')
+    arg_parser.add_argument('--classes', type=int, default=3, help='Classes per code file.')
+    arg_parser.add_argument('--methods', type=int, default=4, help='Own methods per class.')
+    arg_parser.add_argument('--depth', type=int, default=2, help='Length of inheritance chains (1 = no inheritance).')
+    arg_parser.add_argument('--fan-out', type=int, default=1, help='Classes called by every method.')
+    arg_parser.add_argument('--php-ratio', type=float, default=0.0, help='Fraction of code files generated as PHP.')
+    arg_parser.add_argument('-j', '--jobs', type=int, default=None, help='Worker processes for the audit (default: number of CPUs).')
+    arg_parser.add_argument('--creator-files', type=int, default=500,
+                            help='Code files to run the creator on; each one renders its diagram in a subprocess.')
+    arg_parser.add_argument('--stages', default='audit,creator', help='Comma-separated pipelines to run.')
+    arg_parser.add_argument('--repo-dir', metavar='DIR', help='Generate the repository here and keep it (default: a temporary directory).')
+    arg_parser.add_argument('--output', metavar='FILE', help='Write the metrics as JSON.')
+    arg_parser.add_argument('--save-baseline', metavar='FILE', help='Store the metrics as the new baseline.')
+    arg_parser.add_argument('--baseline', metavar='FILE', help='Fail if a metric regressed past this baseline.')
+    arg_parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed regression over the baseline (default: 0.2 = 20%%).')
+    arg_parser.add_argument('--stage', choices=sorted(STAGES), help=argparse.SUPPRESS)
+    arg_parser.add_argument('--result', help=argparse.SUPPRESS)
+    args = arg_parser.parse_args()
+
+    if args.stage:
+        run_stage_in_this_process(args)
+        return
+
+    if args.php_ratio and not shutil.which('php'):
+        arg_parser.error("--php-ratio needs php on PATH.")
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        arg_parser.error(f"unknown stage(s): {', '.join(sorted(unknown))}")
+
+    repo_dir = args.repo_dir or tempfile.mkdtemp(prefix='diagram_audit_load_')
+    try:
+        start = time.perf_counter()
+        generate_repository(repo_dir, args)
+        print(f"Generated {args.files} code files and diagrams in {repo_dir} ({time.perf_counter() - start:.1f} s)\n")
+
+        results = {stage: run_stage(stage, repo_dir, args) for stage in stages}
+    finally:
+        if not args.repo_dir:
+            shutil.rmtree(repo_dir, ignore_errors=True)
+
+    print_metrics(results)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'parameters': {
+                'files': args.files,
+                'classes': args.classes,
+                'methods': args.methods,
+                'depth': args.depth,
+                'fan_out': args.fan_out,
+                'php_ratio': args.php_ratio,
+                'jobs': args.jobs,
+                'creator_files': args.creator_files,
+            },
+        },
+        'stages': results,
+    }
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['meta']['parameters'] != report['meta']['parameters']:
+            print("\n[Warning] Baseline was recorded with different parameters.")
+        regressions = find_regressions(results, baseline['stages'], args.tolerance)
+        if regressions:
+            print("\n❌ Regressions past the baseline:")
+            for regression in regressions:
+                print(f"   {regression}")
+            sys.exit(1)
+        print("\n✅ No regressions past the baseline.")
+
+
+if __name__ == "__main__":
+    main()
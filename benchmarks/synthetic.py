@@ -0,0 +1,107 @@
+"""
+Synthetic Python, PHP and diagram sources for benchmarks.
+
+All three describe the same classes, so a generated code file and its generated
+diagram audit as in sync. Classes form inheritance chains of `depth` classes, and
+every method calls the same method on `fan_out` other classes, which gives one
+diagram edge per method with `fan_out` targets.
+"""
+
+
+def class_name(index: int) -> str:
+    return f"Class{index}"
+
+
+def parent_index(index: int, depth: int):
+    """Index of the parent class, or None for the root of an inheritance chain."""
+    if depth > 1 and index % depth:
+        return index - 1
+    return None
+
+
+def call_targets(index: int, num_classes: int, fan_out: int) -> list:
+    """Indexes of the classes whose methods a method of class `index` calls."""
+    fan_out = min(fan_out, num_classes - 1)
+    return [(index + step * 7 + 1) % num_classes for step in range(fan_out)]
+
+
+def method_name(index: int, method: int) -> str:
+    return f"method_{index}_{method}"
+
+
+def generate_python(num_classes: int, methods_per_class: int, depth: int = 1, fan_out: int = 1, prefix: str = '') -> str:
+    """
+    Generate a Python module.
+
+    Args:
+        num_classes: Number of classes.
+        methods_per_class: Own methods of every class, besides __init__.
+        depth: Length of the inheritance chains; 1 means no inheritance.
+        fan_out: Number of other classes every method calls into.
+        prefix: Prepended to class names, so several generated modules can coexist in one project.
+    """
+    lines = []
+    for i in range(num_classes):
+        parent = parent_index(i, depth)
+        base = f"({prefix}{class_name(parent)})" if parent is not None else ""
+        lines.append(f"class {prefix}{class_name(i)}{base}:")
+        lines.append("    def __init__(self):")
+        lines.append(f"        self.attr_{i} = {i}")
+        for j in range(methods_per_class):
+            lines.append(f"    def {method_name(i, j)}(self, peer):")
+            for target in call_targets(i, num_classes, fan_out):
+                lines.append(f"        peer.{method_name(target, j)}()")
+            lines.append("        return self")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def generate_php(num_classes: int, methods_per_class: int, depth: int = 1, fan_out: int = 1, prefix: str = '') -> str:
+    """Generate a PHP file with the same classes, methods and calls as generate_python."""
+    lines = ["<?php", ""]
+    for i in range(num_classes):
+        parent = parent_index(i, depth)
+        extends = f" extends {prefix}{class_name(parent)}" if parent is not None else ""
+        lines.append(f"class {prefix}{class_name(i)}{extends} {{")
+        lines.append(f"    public $attr_{i} = {i};")
+        for j in range(methods_per_class):
+            lines.append(f"    public function {method_name(i, j)}($peer) {{")
+            for target in call_targets(i, num_classes, fan_out):
+                lines.append(f"        $peer->{method_name(target, j)}();")
+            lines.append("        return $this;")
+            lines.append("    }")
+        lines.append("}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def generate_diagram(num_classes: int, methods_per_class: int, depth: int = 1, fan_out: int = 1, prefix: str = '') -> str:
+    """Generate a `diagrams` file matching generate_python, with the edge styles write_diagram uses."""
+    def var(index: int) -> str:
+        return f"{prefix}{class_name(index)}".lower()
+
+    lines = [
+        "from diagrams import Diagram, Edge",
+        "from diagrams.c4 import Container",
+        "",
+        "with Diagram(\"generated\", show=False):",
+    ]
+    for i in range(num_classes):
+        lines.append(f"    {var(i)} = Container(\"{prefix}{class_name(i)}\")")
+    lines.append("")
+
+    for i in range(num_classes):
+        parent = parent_index(i, depth)
+        if parent is not None:
+            lines.append(f"    {var(i)} >> Edge(label=\"inherits\", style='dashed', color='darkgreen') >> {var(parent)}")
+        targets = call_targets(i, num_classes, fan_out)
+        for j in range(methods_per_class):
+            label = method_name(i, j) + "()"
+            if not targets:
+                lines.append(f"    {var(i)} >> Edge(label=\"{label}\", style='dashed', color='blue') >> {var(i)}")
+            elif len(targets) == 1:
+                lines.append(f"    {var(i)} >> Edge(label=\"{label}\", style='solid', color='red') >> {var(targets[0])}")
+            else:
+                target_vars = ", ".join(var(target) for target in targets)
+                lines.append(f"    {var(i)} >> Edge(label=\"{label}\", style='dotted', color='black') >> [{target_vars}]")
+    return "\n".join(lines) + "\n"
@@ -1,10 +1,38 @@
+import argparse
 import ast
+import atexit
+import contextlib
+import os
 import sys
+import time
+from collections import Counter
 from pprint import pprint
-from utils.logging_utils import log_error
+from utils.logging_utils import log_error, log_info, log_warning
 from utils.python_code_parser import PythonCodeVisitor
 from utils.diagram_parser import DiagramVisitor
-from utils.php_code_parser import extract_php_data
+from utils.diagram_readers import DiagramSyntaxError, diagram_reader
+from utils.php_code_parser import PhpParserError, extract_php_data, extract_php_source_data, php_worker_session, start_php_worker
+from utils.mapping import (
+    DEFAULT_MAPPING_FILE,
+    build_reverse_index,
+    dependent_groups,
+    load_mapping,
+    normalize_path,
+    parse_mapping,
+)
+from utils.git_index import GitError, IndexReader, staged_files
+from utils.parse_cache import ParseCache, cached_parse, configure_cache
+from utils.project_index import build_project_index
+from utils.memory_profile import enable_memory_report, print_memory_report
+from utils.tracing import enable_tracing, span, write_trace
+from utils.workers import map_in_workers
+from utils.reporters import MACHINE_FORMATS, create_machine_reporter
+from utils.watcher import create_watcher
+
+
+class ParseError(Exception):
+    """Raised when a code or diagram file cannot be parsed."""
+
 
 def compare_classes(code_classes: list, diagram_classes: list) -> tuple:
     """
@@ -44,6 +72,28 @@ def compare_methods(code_class_to_methods: dict, diagram_class_to_methods: dict)
     return missing_methods, extra_methods
 
 
+def parse_python_source(content) -> tuple:
+    """
+    Parse and analyze Python source code.
+
+    Args:
+        content: Source code as str or bytes.
+
+    Returns:
+        tuple: (classes, methods, attributes)
+    """
+    try:
+        with span('ast.parse', 'parse'):
+            tree = ast.parse(content)
+    except SyntaxError as e:
+        raise ParseError(f"Error parsing code: {e}") from e
+
+    with span('PythonCodeVisitor', 'visit'):
+        code_visitor = PythonCodeVisitor()
+        code_visitor.visit(tree)
+        return code_visitor.get_results()
+
+
 def parse_python(file_path: str) -> tuple:
     """
     Parse and analyze a code file's content.
@@ -54,18 +104,10 @@ def parse_python(file_path: str) -> tuple:
     Returns:
         tuple: (classes, methods, attributes)
     """
-    try:
-        with open(file_path, 'r') as f:
-            content = f.read()
-        tree = ast.parse(content)
-    except SyntaxError as e:
-        log_error(f"Error parsing code: {e}")
-        return [], {}
+    with span('read', 'io', file=file_path), open(file_path, 'rb') as f:
+        content = f.read()
 
-    code_visitor = PythonCodeVisitor()
-    code_visitor.visit(tree)
-    
-    return code_visitor.get_results()
+    return cached_parse('python', content, lambda: parse_python_source(content))
 
 
 def parse_php(file_path: str) -> tuple:
@@ -77,31 +119,82 @@ def parse_php(file_path: str) -> tuple:
     Returns:
          tuple: (classes, methods, attributes)
     """
-    return extract_php_data(file_path)
+    with span('read', 'io', file=file_path), open(file_path, 'rb') as f:
+        content = f.read()
 
+    try:
+        return cached_parse('php', content, lambda: extract_php_data(file_path))
+    except PhpParserError as e:
+        raise ParseError(str(e)) from e
 
-def parse_diagram_file(diagram_file_name: str) -> tuple:
+
+def parse_diagram_source(diagram_content) -> tuple:
     """
-    Parse and analyze a diagram file's content.
+    Parse and analyze diagram source code.
 
     Args:
-        diagram_file_name: File path to the diagram file.
+        diagram_content: Diagram source as str or bytes.
 
     Returns:
         tuple: (classes, methods, connections, variable_mappings)
     """
     try:
-        with open(diagram_file_name, "r") as f:
-            diagram_content = f.read()
+        with span('ast.parse', 'parse'):
             tree = ast.parse(diagram_content)
     except SyntaxError as e:
-        log_error(f"Error parsing diagram: {e}")
-        sys.exit(1)
+        raise ParseError(f"Error parsing diagram: {e}") from e
+
+    with span('DiagramVisitor', 'visit'):
+        diagram_visitor = DiagramVisitor()
+        diagram_visitor.visit(tree)
+        return diagram_visitor.get_results()
+
 
-    diagram_visitor = DiagramVisitor()
-    diagram_visitor.visit(tree)
+def parse_text_diagram(diagram_format: str, reader, diagram_content: bytes) -> tuple:
+    """
+    Parse a DOT, Mermaid or PlantUML diagram with its reader from utils.diagram_readers.
+
+    Returns:
+        tuple: (classes, methods, connections, variable_mappings), as parse_diagram_source.
+    """
+    try:
+        with span(f'read {diagram_format}', 'parse'):
+            return reader(diagram_content.decode())
+    except (UnicodeDecodeError, DiagramSyntaxError) as e:
+        raise ParseError(f"Error parsing diagram: {e}") from e
+
+
+def parse_diagram_content(diagram_file_name: str, diagram_content: bytes) -> tuple:
+    """
+    Parse diagram content in the format its file extension names: DOT (.dot, .gv),
+    Mermaid (.mmd, .mermaid), PlantUML (.puml, .plantuml, .pu), and otherwise
+    Python code written against the diagrams library.
+    """
+    text_reader = diagram_reader(diagram_file_name)
+    if text_reader is None:
+        return cached_parse('diagram', diagram_content, lambda: parse_diagram_source(diagram_content))
+    diagram_format, reader = text_reader
+    return cached_parse(
+        f'diagram_{diagram_format}',
+        diagram_content,
+        lambda: parse_text_diagram(diagram_format, reader, diagram_content),
+    )
+
+
+def parse_diagram_file(diagram_file_name: str) -> tuple:
+    """
+    Parse and analyze a diagram file's content.
+
+    Args:
+        diagram_file_name: File path to the diagram file.
+
+    Returns:
+        tuple: (classes, methods, connections, variable_mappings)
+    """
+    with span('read', 'io', file=diagram_file_name), open(diagram_file_name, "rb") as f:
+        diagram_content = f.read()
 
-    return diagram_visitor.get_results()
+    return parse_diagram_content(diagram_file_name, diagram_content)
 
 
 def parse_code_file(file_path: str) -> tuple:
@@ -110,8 +203,32 @@ def parse_code_file(file_path: str) -> tuple:
     elif file_path.endswith('.php'):
         return parse_php(file_path)
     else:
-        log_error("Unsupported file type. Only .py and .php are supported.")
-        sys.exit(1)
+        raise ParseError("Unsupported file type. Only .py and .php are supported.")
+
+
+def parse_code_source(file_path: str, content: bytes) -> tuple:
+    """
+    Parse code content that did not come from `file_path` on disk, e.g. a staged blob.
+
+    Args:
+        file_path: Name of the file; its extension selects the parser.
+        content: Raw file content.
+
+    Returns:
+        tuple: (classes, methods, attributes)
+    """
+    if file_path.endswith('.py'):
+        return cached_parse('python', content, lambda: parse_python_source(content))
+    elif file_path.endswith('.php'):
+        try:
+            # The PHP worker takes source text as JSON, which can only carry valid UTF-8.
+            return cached_parse('php', content, lambda: extract_php_source_data(content.decode()))
+        except UnicodeDecodeError as e:
+            raise ParseError(f"Cannot parse PHP source that is not valid UTF-8: {e}") from e
+        except PhpParserError as e:
+            raise ParseError(str(e)) from e
+    else:
+        raise ParseError("Unsupported file type. Only .py and .php are supported.")
 
 
 def output_results(code_file_name, missing_classes, extra_classes, missing_methods, extra_methods):
@@ -137,40 +254,615 @@ def output_results(code_file_name, missing_classes, extra_classes, missing_metho
         print()
 
 
-def main():
-    code_file_name = sys.argv[1]
-    diagram_file_name = sys.argv[2]
-    discrepancies_found = False
+def load_code_model(code_file_name: str, content: bytes = None) -> tuple:
+    """
+    Parse a code file for auditing.
 
-    # Process the given code and diagram file pair
+    Args:
+        code_file_name: File path to the code file.
+        content: Content to parse instead of reading the file, e.g. a staged blob.
+
+    Raises:
+        ParseError: With a message naming the file if it is missing or cannot be parsed.
+    """
     try:
-        
-        code_classes, class_methods, class_attributes = parse_code_file(code_file_name)
-    except FileNotFoundError:
-        log_error(f"Error: Code file {code_file_name} not found.")
-        discrepancies_found = True
-        return
+        if content is not None:
+            return parse_code_source(code_file_name, content)
+        return parse_code_file(code_file_name)
+    except FileNotFoundError as e:
+        if os.path.exists(code_file_name):
+            raise ParseError(f"Error parsing {code_file_name}: {e}") from e
+        raise ParseError(f"Error: Code file {code_file_name} not found.") from e
+    except ParseError as e:
+        raise ParseError(f"{code_file_name}: {e}") from e
+
+
+def load_diagram_model(diagram_file_name: str, content: bytes = None) -> tuple:
+    """
+    Parse a diagram file for auditing.
 
-    # Analyze diagram
-    diagram_classes, diagram_methods, *_ = parse_diagram_file(diagram_file_name)
+    Args:
+        diagram_file_name: File path to the diagram file.
+        content: Content to parse instead of reading the file, e.g. a staged blob.
 
-    # Compare classes and methods
-    missing_classes, extra_classes = compare_classes(code_classes, diagram_classes)
-    missing_methods, extra_methods = compare_methods(class_methods, diagram_methods)
+    Raises:
+        ParseError: With a message naming the file if it is missing or cannot be parsed.
+    """
+    try:
+        if content is not None:
+            return parse_diagram_content(diagram_file_name, content)
+        return parse_diagram_file(diagram_file_name)
+    except FileNotFoundError as e:
+        raise ParseError(f"Error: Diagram file {diagram_file_name} not found.") from e
+    except ParseError as e:
+        raise ParseError(f"{diagram_file_name}: {e}") from e
 
-    # Show results for each file and track discrepancies
-    if missing_classes or extra_classes or missing_methods or extra_methods:
-        discrepancies_found = True
-        output_results(code_file_name, missing_classes, extra_classes, missing_methods, extra_methods)
 
-    # Exit based on discrepancies
-    if discrepancies_found:
+def load_model(role: str, file_path: str, content: bytes = None):
+    """
+    Parse a 'code' or 'diagram' file, returning a ParseError instead of raising it.
+
+    Being a module-level function that never raises for bad input makes it safe to
+    run in worker processes and to keep the outcome as a shared, per-file model.
+    """
+    loader = load_code_model if role == 'code' else load_diagram_model
+    with span(f'load {role}', 'file', file=file_path) as span_args:
+        try:
+            return loader(file_path, content)
+        except ParseError as e:
+            span_args['error'] = str(e)
+            return e
+
+
+def error_result(code_files: tuple, diagram_files: tuple, error: str = None) -> dict:
+    """Build an audit result for a group, with no discrepancies unless `error` is set."""
+    return {
+        'code_files': list(code_files),
+        'diagram_files': list(diagram_files),
+        'missing_classes': set(),
+        'extra_classes': set(),
+        'missing_methods': {},
+        'extra_methods': {},
+        'error': error,
+    }
+
+
+def _merge_dicts_of_lists(dicts) -> dict:
+    """Merge { key: [item, ...] } dicts, keeping the first-seen order of keys and items."""
+    merged = {}
+    for mapping in dicts:
+        for key, items in mapping.items():
+            merged.setdefault(key, {}).update(dict.fromkeys(items))
+    return {key: list(items) for key, items in merged.items()}
+
+
+def merge_code_models(code_models: list) -> tuple:
+    """
+    Union several code models into one.
+
+    Returns:
+        tuple: (classes, methods, attributes)
+    """
+    if len(code_models) == 1:
+        return code_models[0]
+    classes = list(dict.fromkeys(cls for model in code_models for cls in model[0]))
+    class_methods = _merge_dicts_of_lists(model[1] for model in code_models)
+    class_attributes = _merge_dicts_of_lists(model[2] for model in code_models)
+    return classes, class_methods, class_attributes
+
+
+def merge_diagram_models(diagram_models: list) -> tuple:
+    """
+    Union several diagram models into one.
+
+    Returns:
+        tuple: (classes, methods, connections, variable_mappings)
+    """
+    if len(diagram_models) == 1:
+        return diagram_models[0]
+    classes = list(dict.fromkeys(cls for model in diagram_models for cls in model[0]))
+    class_methods = _merge_dicts_of_lists(model[1] for model in diagram_models)
+    connections = [connection for model in diagram_models for connection in model[2]]
+    variable_mappings = {}
+    for model in diagram_models:
+        variable_mappings.update(model[3])
+    return classes, class_methods, connections, variable_mappings
+
+
+def compare_models(code_files: tuple, diagram_files: tuple, code_model: tuple, diagram_model: tuple) -> dict:
+    """
+    Compare an already parsed code model with an already parsed diagram model.
+
+    Args:
+        code_model: (classes, methods, attributes) from parse_code_file.
+        diagram_model: (classes, methods, connections, variable_mappings) from parse_diagram_file.
+
+    Returns:
+        dict: The group and its missing/extra classes and methods.
+    """
+    code_classes, class_methods, *_ = code_model
+    diagram_classes, diagram_methods, *_ = diagram_model
+
+    with span('compare', 'compare', file=', '.join(code_files), diagram=', '.join(diagram_files)):
+        result = error_result(code_files, diagram_files)
+        result['missing_classes'], result['extra_classes'] = compare_classes(code_classes, diagram_classes)
+        result['missing_methods'], result['extra_methods'] = compare_methods(class_methods, diagram_methods)
+    return result
+
+
+def compare_loaded(code_files: tuple, diagram_files: tuple, code_models: list, diagram_models: list) -> dict:
+    """
+    Compare the union of the code models with the union of the diagram models.
+
+    The models are those returned by load_model; if any of them failed to parse,
+    the result carries their ParseError messages instead of a comparison.
+    """
+    errors = [str(model) for model in code_models + diagram_models if isinstance(model, ParseError)]
+    if errors:
+        return error_result(code_files, diagram_files, "\n".join(errors))
+    return compare_models(
+        code_files,
+        diagram_files,
+        merge_code_models(code_models),
+        merge_diagram_models(diagram_models),
+    )
+
+
+def _group_keys(group: tuple) -> list:
+    """The (role, file_path) model keys a (code_files, diagram_files) group needs."""
+    code_files, diagram_files = group
+    return [('code', file_path) for file_path in code_files] + [('diagram', file_path) for file_path in diagram_files]
+
+
+def _compare_group(group: tuple, models: dict) -> dict:
+    code_files, diagram_files = group
+    return compare_loaded(
+        code_files,
+        diagram_files,
+        [models[('code', file_path)] for file_path in code_files],
+        [models[('diagram', file_path)] for file_path in diagram_files],
+    )
+
+
+def load_project_model(project, file_path: str):
+    """The code model of a file from a ProjectIndex, or None if the index does not cover it."""
+    if project is None:
+        return None
+    return project.code_model(file_path)
+
+
+def audit_pair(code_file_name: str, diagram_file_name: str, project=None) -> dict:
+    """
+    Audit one code/diagram pair without exiting the process.
+
+    Args:
+        code_file_name: File path to the code file.
+        diagram_file_name: File path to the diagram file.
+        project: Optional ProjectIndex; Python files it covers inherit methods across modules.
+
+    Returns:
+        dict: The pair, its missing/extra classes and methods, and an error message if parsing failed.
+    """
+    return compare_loaded(
+        (code_file_name,),
+        (diagram_file_name,),
+        [load_project_model(project, code_file_name) or load_model('code', code_file_name)],
+        [load_model('diagram', diagram_file_name)],
+    )
+
+
+def has_discrepancies(result: dict) -> bool:
+    """Whether an audit result failed to parse or found any difference."""
+    return bool(
+        result['error']
+        or result['missing_classes']
+        or result['extra_classes']
+        or result['missing_methods']
+        or result['extra_methods']
+    )
+
+
+def print_pair_header(result: dict) -> None:
+    print("****************************************************")
+    print("Analyzing File Pair:")
+    print(f"   File: {', '.join(result['code_files'])}")
+    print(f"   Diagram: {', '.join(result['diagram_files'])}")
+
+
+def print_pair_result(result: dict) -> None:
+    """Print the outcome of a single group audit."""
+    if result['error']:
+        log_error(result['error'])
+    elif has_discrepancies(result):
+        output_results(
+            ', '.join(result['code_files']),
+            result['missing_classes'],
+            result['extra_classes'],
+            result['missing_methods'],
+            result['extra_methods'],
+        )
+
+    if has_discrepancies(result):
         print("\n❌ Discrepancies found!\n")
-        sys.exit(1)
     else:
         print("\n✅ Files are in sync!\n")
+
+
+class TextReporter:
+    """Print audit results for a terminal, as they arrive."""
+
+    def __init__(self, header: bool = True):
+        self.header = header
+
+    def report(self, result: dict) -> None:
+        if self.header:
+            print_pair_header(result)
+        print_pair_result(result)
+
+    def close(self) -> None:
+        pass
+
+
+def create_reporter(output_format: str = 'text', header: bool = True):
+    """A reporter for --format; machine-readable formats write to the current stdout."""
+    if output_format == 'text':
+        return TextReporter(header)
+    return create_machine_reporter(output_format, sys.stdout)
+
+
+def _parse_files(files: list, jobs: int, contents: dict):
+    """Yield load_model() for each (role, file_path) in order, optionally across a process pool."""
+    items = [(role, file_path, contents.get(file_path)) for role, file_path in files]
+    with php_worker_session() if jobs == 1 or len(items) == 1 else contextlib.nullcontext():
+        yield from map_in_workers(load_model, items, jobs, start_php_worker)
+
+
+def run_batch(groups: list, jobs: int = None, contents: dict = None, project=None):
+    """
+    Audit many code/diagram groups, optionally across a process pool.
+
+    Every distinct file is parsed exactly once, even when it appears in several
+    groups (e.g. a diagram describing many code files), and its model is shared
+    by those groups and released once the last of them has been compared.
+
+    Args:
+        groups: List of (code_files, diagram_files) tuples, see parse_mapping.
+        jobs: Number of worker processes. 1 audits in this process; None uses all CPUs.
+        contents: Optional { file_path: bytes } to parse instead of the files on disk.
+        project: Optional ProjectIndex; code files it covers are taken from it instead of being parsed.
+
+    Yields:
+        dict: One audit result per group, in the order of `groups`.
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    contents = contents or {}
+
+    group_keys = [list(dict.fromkeys(_group_keys(group))) for group in groups]
+    files = list(dict.fromkeys(key for keys in group_keys for key in keys))
+    remaining_uses = Counter(key for keys in group_keys for key in keys)
+
+    models = {}
+    for role, file_path in files:
+        if role == 'code':
+            project_model = load_project_model(project, file_path)
+            if project_model is not None:
+                models[(role, file_path)] = project_model
+    files = [key for key in files if key not in models]
+
+    # Files are parsed in order of first use, so each group's models arrive no later than it needs them.
+    parsed = zip(files, _parse_files(files, jobs, contents))
+    for group, keys in zip(groups, group_keys):
+        while not all(key in models for key in keys):
+            key, model = next(parsed)
+            models[key] = model
+
+        yield _compare_group(group, models)
+
+        for key in keys:
+            remaining_uses[key] -= 1
+            if not remaining_uses[key]:
+                del models[key]
+
+
+def _mapped_files(groups: list) -> set:
+    """Every code and diagram file referenced by the groups."""
+    return {file_path for code_files, diagram_files in groups for file_path in code_files + diagram_files}
+
+
+def audit_mapping(mapping_file: str, jobs: int = None, project=None, reporter=None) -> bool:
+    """
+    Audit every group listed in a mapping file.
+
+    Args:
+        project: Optional ProjectIndex, see run_batch.
+        reporter: Receives each result as soon as its group is audited (default: TextReporter).
+
+    Returns:
+        bool: True if any group has discrepancies or could not be audited.
+    """
+    try:
+        groups = load_mapping(mapping_file)
+    except (OSError, ValueError) as e:
+        log_error(f"Error loading mapping file {mapping_file}: {e}")
+        return True
+
+    if not groups:
+        log_warning(f"No file groups found in {mapping_file}.")
+        return False
+
+    reporter = reporter or TextReporter()
+    discrepancies_found = False
+    for result in run_batch(groups, jobs, project=project):
+        reporter.report(result)
+        discrepancies_found = discrepancies_found or has_discrepancies(result)
+
+    return discrepancies_found
+
+
+def audit_staged(mapping_file: str, jobs: int = None, reporter=None) -> bool:
+    """
+    Audit the staged versions of every mapping group that contains a staged file,
+    whether the staged file is one of its code files or one of its diagrams.
+
+    The staged file list comes from `git diff --cached`, and the mapping, code and
+    diagram contents are read from the git index over one `git cat-file --batch`
+    pipe, so the audit sees exactly what will be committed. Files missing from
+    the index (e.g. untracked diagrams) are read from the working tree.
+
+    Args:
+        reporter: Receives each result as soon as its group is audited (default: TextReporter).
+
+    Returns:
+        bool: True if any group has discrepancies or could not be audited.
+    """
+    reporter = reporter or TextReporter()
+    try:
+        staged = [normalize_path(path) for path in staged_files()]
+    except (GitError, OSError) as e:
+        log_error(f"Error listing staged files: {e}")
+        return True
+
+    if not staged:
+        return False
+
+    def read(index: IndexReader, file_path: str):
+        content = index.read(file_path)
+        if content is None and os.path.isfile(file_path):
+            with open(file_path, 'rb') as f:
+                content = f.read()
+        return content
+
+    try:
+        with IndexReader() as index:
+            mapping_content = read(index, normalize_path(mapping_file))
+            if mapping_content is None:
+                log_error(f"Error loading mapping file {mapping_file}: not found.")
+                return True
+            try:
+                groups = parse_mapping(mapping_content, mapping_file)
+            except ValueError as e:
+                log_error(f"Error loading mapping file {mapping_file}: {e}")
+                return True
+
+            reverse_index = build_reverse_index(groups)
+            for file_path in staged:
+                if file_path.endswith(('.py', '.php')) and file_path not in reverse_index:
+                    print(f"⚠️ No diagram mapping found for {file_path}. Skipping.")
+
+            # A staged diagram schedules every group, and so every code file, that depends on it.
+            affected = dependent_groups(reverse_index, staged)
+            contents = {file_path: read(index, file_path) for file_path in _mapped_files(affected)}
+    except (GitError, OSError) as e:
+        log_error(f"Error reading the git index: {e}")
+        return True
+
+    discrepancies_found = False
+    if affected:
+        for result in run_batch(affected, jobs, contents):
+            reporter.report(result)
+            discrepancies_found = discrepancies_found or has_discrepancies(result)
+    return discrepancies_found
+
+
+class _ModelStore:
+    """Parsed code and diagram models kept in memory between re-audits."""
+
+    def __init__(self):
+        self.models = {}
+
+    def load(self, role: str, file_path: str) -> None:
+        self.models[(role, file_path)] = load_model(role, file_path)
+
+    def ensure(self, groups: list) -> None:
+        for group in groups:
+            for role, file_path in _group_keys(group):
+                if (role, file_path) not in self.models:
+                    self.load(role, file_path)
+
+    def reload(self, changed: set) -> None:
+        for role, file_path in list(self.models):
+            if file_path in changed:
+                self.load(role, file_path)
+
+    def audit(self, group: tuple) -> dict:
+        return _compare_group(group, self.models)
+
+
+def watch_mapping(mapping_file: str, interval: float = 0.5, reporter=None) -> None:
+    """
+    Audit every group in a mapping file, then re-audit on every change until interrupted.
+
+    Parsed models stay in memory, so a change re-parses only the changed files and
+    re-compares only the groups that use them. Editing the mapping file itself
+    reloads it and re-audits every group.
+
+    Args:
+        mapping_file: Path to the JSON mapping file.
+        interval: Polling interval in seconds when inotify is unavailable.
+        reporter: Receives every result (default: TextReporter).
+    """
+    reporter = reporter or TextReporter()
+    try:
+        groups = load_mapping(mapping_file)
+    except (OSError, ValueError) as e:
+        log_error(f"Error loading mapping file {mapping_file}: {e}")
+        sys.exit(1)
+    reverse_index = build_reverse_index(groups)
+
+    store = _ModelStore()
+    with php_worker_session():
+        store.ensure(groups)
+        for group in groups:
+            reporter.report(store.audit(group))
+
+        watched = _mapped_files(groups) | {mapping_file}
+        watcher = create_watcher(watched, interval)
+        log_info(f"Watching {len(watched)} file(s) with {type(watcher).__name__}. Press Ctrl+C to stop.")
+
+        try:
+            while True:
+                changed = watcher.wait()
+                start = time.perf_counter()
+
+                if mapping_file in changed:
+                    try:
+                        groups = load_mapping(mapping_file)
+                    except (OSError, ValueError) as e:
+                        log_error(f"Error loading mapping file {mapping_file}: {e}")
+                        continue
+                    reverse_index = build_reverse_index(groups)
+                    for path in sorted(_mapped_files(groups)):
+                        try:
+                            watcher.add([path])
+                        except OSError as e:
+                            # e.g. a directory that does not exist yet; the next mapping reload retries it.
+                            log_warning(f"Cannot watch {path}: {e}")
+                    affected = groups
+                else:
+                    affected = dependent_groups(reverse_index, changed)
+
+                store.reload(changed)
+                store.ensure(affected)
+                results = [store.audit(group) for group in affected]
+                elapsed_ms = (time.perf_counter() - start) * 1000
+
+                for result in results:
+                    reporter.report(result)
+                log_info(f"Re-audited {len(results)} group(s) for {len(changed)} changed file(s) in {elapsed_ms:.1f} ms.")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            watcher.close()
+
+
+def build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='diagram-audit',
+        description='Compare code files against their diagrams.',
+    )
+    parser.add_argument('code_file', nargs='?', help='Code file (.py or .php) to audit.')
+    parser.add_argument('diagram_file', nargs='?', help='Diagram file describing the code file.')
+    parser.add_argument('--all', action='store_true',
+                        help=f'Audit every pair listed in {DEFAULT_MAPPING_FILE}.')
+    parser.add_argument('--mapping', metavar='FILE',
+                        help='Audit every pair listed in the given mapping file.')
+    parser.add_argument('--staged', action='store_true',
+                        help='Audit the staged contents of staged code files (for pre-commit hooks).')
+    parser.add_argument('--watch', action='store_true',
+                        help='Audit every mapped pair, then re-audit changed files until interrupted.')
+    parser.add_argument('--poll-interval', type=float, default=0.5, metavar='SECONDS',
+                        help='Polling interval for --watch when inotify is unavailable.')
+    parser.add_argument('--format', choices=('text', *MACHINE_FORMATS), default='text',
+                        help='Output format; json, ndjson and sarif write one record per pair as it finishes, '
+                             'with every other message on stderr.')
+    parser.add_argument('--project', metavar='DIR',
+                        help='Index every Python module under DIR so inheritance is resolved across files.')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Worker processes for batch audits (default: number of CPUs).')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Parse every file even if an unchanged copy is in the parse cache.')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='Write a Chrome trace-event JSON file with the time spent in every stage.')
+    parser.add_argument('--memory-report', action='store_true',
+                        help='Report peak and retained memory per stage and per file (implies --jobs 1).')
+    parser.add_argument('--clear-cache', action='store_true',
+                        help='Remove all entries from the parse cache before auditing.')
+    parser.add_argument('--invalidate', nargs='+', metavar='FILE',
+                        help='Drop the parse cache entries for the current content of each FILE before auditing.')
+    return parser
+
+
+def main():
+    parser = build_arg_parser()
+    args = parser.parse_args()
+
+    if args.trace:
+        enable_tracing()
+        atexit.register(write_trace, args.trace, 'diagram-audit')
+
+    configure_cache(enabled=not args.no_cache)
+    batch = args.all or args.mapping or args.staged
+    if args.clear_cache:
+        ParseCache().clear()
+    for file_path in args.invalidate or ():
+        ParseCache().invalidate(file_path)
+    if args.clear_cache or args.invalidate:
+        if not (batch or args.watch or args.code_file):
+            sys.exit(0)
+
+    if args.jobs is not None and args.jobs < 1:
+        parser.error("--jobs must be at least 1.")
+    if args.memory_report:
+        # tracemalloc sees only this process, so everything is parsed here.
+        if args.jobs not in (None, 1):
+            log_warning("--memory-report audits in a single process; ignoring --jobs.")
+        args.jobs = 1
+        enable_memory_report()
+        atexit.register(print_memory_report)
+    if args.project and (args.watch or args.staged):
+        parser.error("--project cannot be combined with --watch or --staged.")
+    if args.watch and args.format in ('json', 'sarif'):
+        parser.error("--watch never finishes its output; use --format ndjson or text.")
+    if (args.watch or batch) and (args.code_file or args.diagram_file):
+        parser.error("--all/--mapping/--staged/--watch cannot be combined with a code/diagram pair.")
+    if not (args.watch or batch) and not (args.code_file and args.diagram_file):
+        parser.error("a code file and a diagram file are required unless --all, --mapping or --staged is given.")
+
+    reporter = create_reporter(args.format, header=bool(batch or args.watch))
+    if args.format != 'text':
+        # Records own stdout; logs, warnings and the memory report go to stderr.
+        sys.stdout = sys.stderr
+
+    if args.watch:
+        watch_mapping(args.mapping or DEFAULT_MAPPING_FILE, args.poll_interval, reporter)
         sys.exit(0)
 
+    if batch:
+        if args.staged:
+            discrepancies_found = audit_staged(args.mapping or DEFAULT_MAPPING_FILE, args.jobs, reporter)
+        else:
+            project = build_project_index(args.project, args.jobs) if args.project else None
+            discrepancies_found = audit_mapping(args.mapping or DEFAULT_MAPPING_FILE, args.jobs, project, reporter)
+        reporter.close()
+        if args.format != 'text':
+            sys.exit(1 if discrepancies_found else 0)
+        print("Final Result:")
+        if discrepancies_found:
+            print("❌ Discrepancies found! Commit aborted.")
+            sys.exit(1)
+        print("✅ All files are in sync! Proceeding with commit.")
+        sys.exit(0)
+
+    # Process the given code and diagram file pair
+    project = build_project_index(args.project, args.jobs) if args.project else None
+    result = audit_pair(args.code_file, args.diagram_file, project)
+    reporter.report(result)
+    reporter.close()
+
+    # Exit based on discrepancies
+    sys.exit(1 if has_discrepancies(result) else 0)
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,10 +1,38 @@
+import argparse
+import ast
+import atexit
+import contextlib
+import functools
+import glob
+import io
+import json
+import os
 import sys
 import subprocess
-from diagram_code_auditor import parse_code_file
-from utils.php_code_parser import extract_connections
-from utils.connection_parser import extract_connection_triples
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from diagram_code_auditor import ParseError
+from utils.logging_utils import log_error, log_info
+from utils.php_code_parser import PhpParserError, extract_php_model, php_worker_session, start_php_worker
+from utils.parse_cache import cached_parse, configure_cache
+from utils.connection_parser import extract_model_from_tree
+from utils.project_index import SKIPPED_DIRS, build_project_index
+from utils.memory_profile import enable_memory_report, print_memory_report
+from utils.render_cache import get_render_cache, render_key
+from utils.diagram_emitters import dot_source, mermaid_source, plantuml_source
+from utils.tracing import enable_tracing, span, write_trace
+from utils.workers import map_in_workers
 
-def write_diagram(file_path, diagram_name, classes, class_to_methods, connections):
+DIAGRAM_PREFIX = 'diagram_for_'
+
+# File extension of every output format; 'diagrams' is the Python code the auditor reads.
+FORMAT_EXTENSIONS = {'diagrams': '.py', 'dot': '.dot', 'mermaid': '.mmd', 'plantuml': '.puml'}
+
+# Emitters of the text formats, all fed by the model write_diagram draws.
+TEXT_EMITTERS = {'dot': dot_source, 'mermaid': mermaid_source, 'plantuml': plantuml_source}
+
+def write_diagram(file_path, diagram_name, classes, class_to_methods, connections, render=True):
     """
     Write a diagram code to represent classes, methods, and connections.
 
@@ -14,17 +42,22 @@ def write_diagram(file_path, diagram_name, classes, class_to_methods, connection
         classes (list): List of class names.
         class_to_methods (dict): Methods for each class.
         connections (list): Relationships between classes.
+        render (bool): Also run the diagram code to render its PNG, unless the PNG
+            was already rendered from identical code by the same renderer version.
+
+    Returns:
+        source (str): The diagram code written.
     """
-    file_path = '.'.join(file_path.split('.')[:-1]) + '.py'
+    file_path = os.path.splitext(file_path)[0] + '.py'
     graph_attr = {"splines": "polyline"}
 
-    with open(file_path, 'w') as f:
+    with span('write diagram', 'write', file=file_path), io.StringIO() as f:
         # Start the diagram
         f.write("from diagrams import Diagram, Edge\n")
         f.write("from diagrams.c4 import Container\n")
 
         f.write(f"graph_attr = {graph_attr}\n\n")
-        f.write(f"with Diagram(\"{' '.join(diagram_name.split('/')[-1].split('_'))}\", filename= \"./{file_path.split('.')[0]}\", direction=\"LR\", show=False, graph_attr=graph_attr):\n")
+        f.write(f"with Diagram(\"{' '.join(diagram_name.split('/')[-1].split('_'))}\", filename= {json.dumps(image_stem(file_path))}, direction=\"LR\", show=False, graph_attr=graph_attr):\n")
 
         # Define classes as variables
         for cls in classes:
@@ -57,41 +90,420 @@ def write_diagram(file_path, diagram_name, classes, class_to_methods, connection
             for method in methods:
                 if (cls, method) not in connected_methods:
                     f.write(f"    {cls.lower()} >> Edge(label=\"{method}\", style='dashed', color='blue') >> {cls.lower()}\n")
-    f.close()
-    subprocess.run(['python3', file_path])
+        source = f.getvalue()
+        with open(file_path, 'w') as out:
+            out.write(source)
+
+    if render:
+        render_diagram(file_path, source)
+    return source
 
-def extract_connection(file_path, classes, class_to_methods, class_to_attributes):
+def write_text_diagram(output_format, file_path, diagram_name, classes, class_to_methods, connections):
     """
-    Extract connections from a code file.
+    Write the diagram in a text format of TEXT_EMITTERS (DOT, Mermaid or PlantUML), without rendering it.
+
+    Args:
+        output_format (str): 'dot', 'mermaid' or 'plantuml'.
+        file_path (str): The path of the diagram file; its extension is replaced by the format's.
+
+    Returns:
+        source (str): The text written.
+    """
+    file_path = output_path(file_path, output_format)
+    with span('write diagram', 'write', file=file_path, format=output_format):
+        source = TEXT_EMITTERS[output_format](diagram_name, classes, class_to_methods, connections)
+        with open(file_path, 'w') as f:
+            f.write(source)
+    return source
+
+def output_path(diagram_path, output_format):
+    """Path of a diagram in an output format, e.g. diagram_for_x.py -> diagram_for_x.dot."""
+    return os.path.splitext(diagram_path)[0] + FORMAT_EXTENSIONS[output_format]
+
+def _render(command, file_path, image_path, source):
+    """
+    Run a render command, skipping it when the render cache shows the image on disk
+    was rendered from the same source.
+
+    Returns:
+        bool: False if the command failed.
+    """
+    render_cache = get_render_cache()
+    key = render_key(source) if render_cache else None
+    with span('render', 'subprocess', file=file_path) as span_args:
+        if render_cache and render_cache.is_current(image_path, key):
+            span_args['cached'] = True
+            log_info(f"{image_path} is up to date; skipping render.")
+            return True
+        try:
+            completed = subprocess.run(command)
+        except OSError as e:
+            log_error(f"Cannot run {command[0]}: {e}")
+            return False
+    if completed.returncode != 0:
+        return False
+    if render_cache:
+        render_cache.record(image_path, key)
+    return True
+
+def image_stem(file_path):
+    """
+    Path of a diagram file's PNG without its extension, as written to its `filename`.
+
+    `diagrams` resolves it against the working directory of the render, which runs
+    `python3 file_path` from the current directory, so the path is kept relative to it.
+    """
+    stem = os.path.splitext(file_path)[0]
+    return stem if os.path.isabs(stem) else os.path.join(os.curdir, stem)
+
+def render_diagram(file_path, source):
+    """Run a written diagram file to render its PNG, unless the render cache has it."""
+    # The diagram is written with filename=image_stem(file_path) and the default PNG format.
+    image_path = os.path.splitext(file_path)[0] + '.png'
+    return _render(['python3', file_path], file_path, image_path, source)
+
+def render_dot(file_path, source):
+    """Render a written DOT file to a PNG next to it with a single `dot` call, unless the render cache has it."""
+    image_path = os.path.splitext(file_path)[0] + '.png'
+    return _render(['dot', '-Tpng', '-o', image_path, file_path], file_path, image_path, source)
+
+RENDERERS = {'diagrams': render_diagram, 'dot': render_dot}
+
+def write_formats(diagram_path, diagram_name, classes, class_to_methods, connections, formats=('diagrams',)):
+    """
+    Write a diagram in every requested format without rendering it.
+
+    Returns:
+        tuple: (format, path, source) of the output to render the PNG from, or None if
+        no format renders. DOT is preferred, since `dot` is faster than the diagrams library.
+    """
+    sources = {}
+    for output_format in formats:
+        if output_format == 'diagrams':
+            sources[output_format] = write_diagram(diagram_path, diagram_name, classes, class_to_methods, connections, render=False)
+        else:
+            sources[output_format] = write_text_diagram(output_format, diagram_path, diagram_name, classes, class_to_methods, connections)
+    for output_format in ('dot', 'diagrams'):
+        if output_format in sources:
+            return output_format, output_path(diagram_path, output_format), sources[output_format]
+    return None
+
+def render_output(render_job):
+    """Render the PNG of a (format, path, source) job from write_formats; False if rendering failed."""
+    output_format, file_path, source = render_job
+    return RENDERERS[output_format](file_path, source)
+
+def parse_python_model(content) -> tuple:
+    """
+    Parse Python source once and extract its structure and connections.
+
+    Args:
+        content: Source code as str or bytes.
+
+    Returns:
+        tuple: (classes, class_to_methods, class_to_attributes, connections)
+    """
+    try:
+        with span('ast.parse', 'parse'):
+            tree = ast.parse(content)
+    except SyntaxError as e:
+        raise ParseError(f"Error parsing code: {e}") from e
+    return extract_model_from_tree(tree)
+
+def extract_code_model(file_path):
+    """
+    Extract classes, methods, attributes and connections from a code file.
+
+    Python and PHP files are read and parsed once for both the structure and the connections.
 
     Args:
         file_path (str): The path of the code file.
-        classes (list): List of class names.
-        class_to_methods (dict): Methods for each class.
-        class_to_attributes (dict): Attributes for each class.
 
     Returns:
-        connections (list): A list of connections between classes.
+        tuple: (classes, class_to_methods, class_to_attributes, connections)
     """
-    connections = []
-    if file_path.endswith('.py'):
-        with open(file_path, 'r') as f:
+    if not file_path.endswith(('.py', '.php')):
+        raise ParseError("Unsupported file type. Only .py and .php are supported.")
+
+    with span('extract model', 'file', file=file_path):
+        with span('read', 'io', file=file_path), open(file_path, 'rb') as f:
             content = f.read()
-        connections = extract_connection_triples(content, classes, class_to_methods, class_to_attributes)
-    elif file_path.endswith('.php'):
-        connections = extract_connections(file_path)
-    return connections
+        if file_path.endswith('.py'):
+            return cached_parse('python_model', content, lambda: parse_python_model(content))
+        return cached_parse('php_model', content, lambda: extract_php_model(file_path))
+
+def extract_project_model(project, file_path):
+    """
+    Take a file's model from a ProjectIndex, so inherited methods and connections
+    to classes of other modules are included. Returns None if the index does not cover the file.
+
+    Returns:
+        tuple: (classes, class_to_methods, class_to_attributes, connections)
+    """
+    code_model = project.code_model(file_path)
+    if code_model is None:
+        return None
+    return code_model + (project.connections(file_path),)
+
+def find_code_files(paths):
+    """
+    Expand code files, directories and glob patterns into the .py and .php files to draw.
+
+    Directories are searched recursively, skipping VCS, cache and virtualenv directories
+    and previously generated diagrams. Files keep the order of `paths`, without duplicates.
+
+    Returns:
+        tuple: (files, unmatched, roots) where unmatched lists the paths that matched nothing
+        and roots maps every file to the directory it was found in: the directory given,
+        the part of a glob pattern before its first wildcard, or a file's own directory.
+    """
+    files = []
+    unmatched = []
+    roots = {}
+    for path in paths:
+        root = path
+        if os.path.isdir(path):
+            matches = []
+            for directory, subdirectories, file_names in os.walk(path):
+                subdirectories[:] = sorted(name for name in subdirectories if name not in SKIPPED_DIRS)
+                matches.extend(
+                    os.path.join(directory, name) for name in sorted(file_names)
+                    if name.endswith(('.py', '.php')) and not name.startswith(DIAGRAM_PREFIX)
+                )
+        elif glob.has_magic(path):
+            while glob.has_magic(root):
+                root = os.path.dirname(root)
+            matches = [match for match in sorted(glob.glob(path, recursive=True))
+                       if match.endswith(('.py', '.php')) and not os.path.basename(match).startswith(DIAGRAM_PREFIX)]
+        else:
+            root = os.path.dirname(path)
+            matches = [path] if os.path.exists(path) else []
+        if not matches:
+            unmatched.append(path)
+        for match in matches:
+            files.append(os.path.normpath(match))
+            roots.setdefault(files[-1], os.path.normpath(root or os.curdir))
+    return list(dict.fromkeys(files)), unmatched, roots
+
+def diagram_path_for(file_path, output_dir=None, root=None, keep_extension=False):
+    """
+    Path of the diagram file generated for a code file.
+
+    Without `output_dir` the diagram goes to the current directory, as for a single file.
+    Otherwise it goes under `output_dir` at the code file's path relative to the current
+    directory, so code files with the same name in different directories get their own
+    diagrams. Code files outside the current directory are placed at their path relative
+    to `root`, the directory they were found in (default: their own directory).
+    With `keep_extension` the code file's extension stays in the name, e.g.
+    x.php -> diagram_for_x_php.py, for code files whose stems collide.
+    """
+    # Diagrams are Python files whatever the language of the code, see write_diagram.
+    stem, extension = os.path.splitext(os.path.basename(file_path))
+    if keep_extension:
+        stem += '_' + extension.lstrip('.')
+    name = DIAGRAM_PREFIX + stem + '.py'
+    if output_dir is None:
+        return name
+    relative_path = os.path.relpath(file_path)
+    if relative_path == os.pardir or relative_path.startswith(os.pardir + os.sep):
+        relative_path = os.path.relpath(file_path, root or os.path.dirname(file_path) or os.curdir)
+    return os.path.normpath(os.path.join(output_dir, os.path.dirname(relative_path), name))
+
+def create_diagram_files(file_path, diagram_path, model=None, formats=('diagrams',)):
+    """
+    Extract a code file's model (unless given) and write its diagram files without rendering.
+
+    Never raises for a bad code file, so it is safe to run in worker processes.
+
+    Returns:
+        tuple: (render_job, error) with write_formats' render job, or None and the error message.
+    """
+    try:
+        classes, class_to_methods, class_to_attributes, connections = model or extract_code_model(file_path)
+    except (ParseError, PhpParserError, OSError) as e:
+        return None, f"{file_path}: {e}"
+    try:
+        os.makedirs(os.path.dirname(diagram_path) or '.', exist_ok=True)
+        return write_formats(diagram_path, file_path, classes, class_to_methods, connections, formats), None
+    except OSError as e:
+        return None, f"{file_path}: cannot write {diagram_path}: {e}"
+
+def _create_files(tasks, jobs, formats):
+    """Yield create_diagram_files() for each (file_path, diagram_path, model) in order, optionally across a process pool."""
+    create = functools.partial(create_diagram_files, formats=formats)
+    with php_worker_session() if jobs == 1 or len(tasks) == 1 else contextlib.nullcontext():
+        yield from map_in_workers(create, tasks, jobs, start_php_worker)
+
+def create_diagrams(files, output_dir=None, jobs=None, render_jobs=None, render=True, project=None, formats=('diagrams',), roots=None):
+    """
+    Create the diagrams of many code files.
+
+    Models are extracted and diagram files written in `jobs` worker processes; each
+    written diagram is handed to a pool of `render_jobs` threads that run the render
+    subprocesses while extraction goes on. A failing file does not stop the run.
+
+    Args:
+        files (list): Code files, e.g. from find_code_files.
+        output_dir (str): Root directory of the diagrams, see diagram_path_for; None writes
+            every diagram next to its code file.
+        jobs (int): Extraction worker processes; None uses all CPUs.
+        render_jobs (int): Concurrent renders; defaults to `jobs`.
+        render (bool): Render the PNGs, as in write_diagram.
+        project: Optional ProjectIndex; files it covers take their models from it instead of being parsed.
+        formats (tuple): Output formats, see write_formats.
+        roots (dict): Directory each file was found in, from find_code_files.
+
+    Returns:
+        tuple: (created, failures) with the number of diagrams written and a list of (file_path, error).
+    """
+    jobs = jobs or os.cpu_count() or 1
+    render_jobs = render_jobs or jobs
+    failures = []
+
+    def path_for(file_path, keep_extension=False):
+        if output_dir is None:
+            return os.path.join(os.path.dirname(file_path), diagram_path_for(file_path, keep_extension=keep_extension))
+        return diagram_path_for(file_path, output_dir, (roots or {}).get(file_path), keep_extension)
+
+    # x.py and x.php in one directory would share diagram_for_x.py; x.py keeps it
+    # and the other languages get their extension in the name.
+    diagram_paths = {file_path: path_for(file_path) for file_path in files}
+    users = Counter(diagram_paths.values())
+    for file_path, diagram_path in diagram_paths.items():
+        if users[diagram_path] > 1 and not file_path.endswith('.py'):
+            diagram_paths[file_path] = path_for(file_path, keep_extension=True)
+
+    tasks = []
+    owners = {}
+    for file_path in files:
+        diagram_path = diagram_paths[file_path]
+        if diagram_path in owners:
+            failures.append((file_path, f"{file_path}: {diagram_path} is already the diagram of {owners[diagram_path]}."))
+            continue
+        owners[diagram_path] = file_path
+        model = extract_project_model(project, file_path) if project else None
+        tasks.append((file_path, diagram_path, model))
+    if not tasks:
+        return 0, failures
+
+    created = 0
+    renders = []
+    render_pool = ThreadPoolExecutor(max_workers=render_jobs) if render and render_jobs > 1 else None
+    try:
+        for (file_path, _, _), (render_job, error) in zip(tasks, _create_files(tasks, jobs, formats)):
+            if error:
+                failures.append((file_path, error))
+                continue
+            created += 1
+            if not render or render_job is None:
+                continue
+            if render_pool:
+                renders.append((file_path, render_job[1], render_pool.submit(render_output, render_job)))
+            elif not render_output(render_job):
+                failures.append((file_path, f"{file_path}: rendering {render_job[1]} failed."))
+        for file_path, rendered_path, future in renders:
+            if not future.result():
+                failures.append((file_path, f"{file_path}: rendering {rendered_path} failed."))
+    finally:
+        if render_pool:
+            render_pool.shutdown()
+    return created, failures
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(
+        prog='diagram-create',
+        description='Generate diagrams from code files.',
+    )
+    parser.add_argument('paths', nargs='+', metavar='PATH',
+                        help='Code file (.py or .php), directory or glob pattern to draw.')
+    parser.add_argument('-o', '--output-dir', metavar='DIR',
+                        help='Write diagrams under DIR at the path of each code file relative to the current '
+                             'directory, or for files outside it, to the directory or glob they were found in '
+                             '(default for several files: next to each code file).')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='Worker processes extracting models and writing diagrams (default: number of CPUs).')
+    parser.add_argument('--render-jobs', type=int, default=None,
+                        help='Diagrams rendered at the same time (default: --jobs).')
+    parser.add_argument('--format', dest='formats', action='append', choices=tuple(FORMAT_EXTENSIONS), metavar='FORMAT',
+                        help='Diagram format to write: diagrams (Python code for the auditor, the default), dot, '
+                             'mermaid or plantuml. Repeat for several; with dot, the PNG is rendered by Graphviz '
+                             'directly, and mermaid and plantuml are text only.')
+    parser.add_argument('--no-render', action='store_true',
+                        help='Only write the diagram files; do not render a PNG.')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Parse the code file and render the diagram even if cached results are up to date.')
+    parser.add_argument('--project', metavar='DIR',
+                        help='Index every Python module under DIR so inheritance and connections span files.')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='Write a Chrome trace-event JSON file with the time spent in every stage.')
+    parser.add_argument('--memory-report', action='store_true',
+                        help='Report peak and retained memory per stage.')
+    return parser
 
 def main():
-    file_path = sys.argv[1]
-    folder = ''
-    diagram_path = folder + 'diagram_for_' + file_path.split('/')[-1]
+    parser = build_arg_parser()
+    args = parser.parse_args()
+    if (args.jobs is not None and args.jobs < 1) or (args.render_jobs is not None and args.render_jobs < 1):
+        parser.error("--jobs and --render-jobs must be at least 1.")
+    configure_cache(enabled=not args.no_cache)
+    if args.trace:
+        enable_tracing()
+        atexit.register(write_trace, args.trace, 'diagram-create')
+    if args.memory_report:
+        # tracemalloc sees only this process and its stages must not interleave across threads.
+        args.jobs = args.render_jobs = 1
+        enable_memory_report()
+        atexit.register(print_memory_report)
+    args.formats = tuple(dict.fromkeys(args.formats or ['diagrams']))
+
+    single_file = len(args.paths) == 1 and os.path.isfile(args.paths[0]) and not args.output_dir
+    if not single_file:
+        sys.exit(main_batch(args))
+
+    file_path = args.paths[0]
+    diagram_path = diagram_path_for(file_path)
+
+    try:
+        model = None
+        if args.project:
+            model = extract_project_model(build_project_index(args.project, args.jobs), file_path)
+        classes, class_to_methods, class_to_attributes, connections = model or extract_code_model(file_path)
+    except (ParseError, PhpParserError) as e:
+        log_error(str(e))
+        sys.exit(1)
+
+    render_job = write_formats(diagram_path, file_path, classes, class_to_methods, connections, args.formats)
+    if render_job and not args.no_render:
+        render_output(render_job)
 
-    classes, class_to_methods, class_to_attributes = parse_code_file(file_path)
+def main_batch(args):
+    """Create the diagrams of every file matched by args.paths; returns the exit code."""
+    files, unmatched, roots = find_code_files(args.paths)
+    for path in unmatched:
+        log_error(f"No .py or .php files match {path}.")
+    if not files:
+        return 1
 
-    connections = extract_connection(file_path, classes, class_to_methods, class_to_attributes)
+    start = time.perf_counter()
+    project = build_project_index(args.project, args.jobs) if args.project else None
+    created, failures = create_diagrams(
+        files,
+        args.output_dir,
+        args.jobs,
+        args.render_jobs,
+        render=not args.no_render,
+        project=project,
+        formats=args.formats,
+        roots=roots,
+    )
+    elapsed = time.perf_counter() - start
 
-    write_diagram(diagram_path, file_path, classes, class_to_methods, connections)
+    log_info(f"Created {created} of {len(files)} diagram(s) in {elapsed:.1f} s.")
+    if failures:
+        log_error(f"{len(failures)} file(s) failed:")
+        for _, error in failures:
+            print(f"   {error}")
+    return 1 if failures or unmatched else 0
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
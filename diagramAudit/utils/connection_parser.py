@@ -1,5 +1,6 @@
 import ast
-from diagramAudit.utils.logging_utils import log_error
+from utils.python_code_parser import PythonCodeVisitor
+from utils.tracing import span
 
 class ConnectionParser(ast.NodeVisitor):
     """
@@ -19,15 +20,22 @@ class ConnectionParser(ast.NodeVisitor):
         super().__init__()
         self.known_classes = set(known_classes)
 
+        self.initial_known_classes = frozenset(self.known_classes)
+
         self.class_to_methods = class_to_methods if class_to_methods else {}
         self.class_to_attrs = class_to_attrs if class_to_attrs else {}
 
+        # Inverted indexes, e.g. "borrow()" -> ["Book"], so each lookup is O(1)
+        self.method_to_classes = self._build_index(self.class_to_methods)
+        self.attr_to_classes = self._build_index(self.class_to_attrs)
+
         # pprint(known_classes)
         # pprint(class_to_methods)
         # pprint(class_to_attrs)
         # print('************')
 
         self.connections = []
+        self._connection_keys = set()
 
         self.current_class = None
         self.current_method = None
@@ -44,9 +52,7 @@ class ConnectionParser(ast.NodeVisitor):
         if len(node.bases) > 0:
             for base in node.bases:
                 if isinstance(base, ast.Name):
-                    self.known_classes.add(base.id)
-                    self.current_method = 'inherits'
-                    self._add_to_connections([base.id])
+                    self._add_inheritance(base.id)
         self.generic_visit(node)
         self.current_class = None
 
@@ -76,7 +82,7 @@ class ConnectionParser(ast.NodeVisitor):
                 method_attr = node.func.attr        # e.g. 'borrow'
                 self._refine_guess_from_method(var_name, method_attr)
             elif isinstance(node.func, ast.Call):
-                self._add_to_connections([self.current_class])
+                self._add_self_connection()
 
         self.generic_visit(node)
 
@@ -90,8 +96,7 @@ class ConnectionParser(ast.NodeVisitor):
         if self.current_class and self.current_method:
             if isinstance(node.value, ast.Call):
                 if isinstance(node.value.func, ast.Name):
-                    if node.value.func.id in self.known_classes:
-                        self._add_to_connections([node.value.func.id])
+                    self._refine_guess_from_constructor(node.value.func.id)
 
         self.generic_visit(node)
 
@@ -117,6 +122,41 @@ class ConnectionParser(ast.NodeVisitor):
     # HELPER METHODS
     ###########################################################
 
+    @staticmethod
+    def _build_index(class_to_members: dict) -> dict:
+        """
+        Invert { class: [member, ...] } into { member: [class, ...] }.
+        Classes keep the order of `class_to_members` and appear once per member.
+        """
+        index = {}
+        for cls, members in class_to_members.items():
+            for member in members:
+                classes = index.setdefault(member, [])
+                if not classes or classes[-1] != cls:
+                    classes.append(cls)
+        return index
+
+    def _add_inheritance(self, base_name: str):
+        """
+        e.g., `class Dog(Animal)` => Animal becomes a known class and Dog 'inherits' it.
+        """
+        self.known_classes.add(base_name)
+        self.current_method = 'inherits'
+        self._add_to_connections([base_name])
+
+    def _add_self_connection(self):
+        """
+        e.g., `make()()` => the result of a call is called, which is recorded against the current class.
+        """
+        self._add_to_connections([self.current_class])
+
+    def _refine_guess_from_constructor(self, class_name: str):
+        """
+        e.g., `self.book = Book(...)` => connect to Book if it is a known class.
+        """
+        if class_name in self.known_classes:
+            self._add_to_connections([class_name])
+
     def _refine_guess_from_method(self, var_name: str, method_attr: str):
         """
         e.g., method_attr='borrow' => we look for 'borrow()' in class_to_methods 
@@ -124,18 +164,7 @@ class ConnectionParser(ast.NodeVisitor):
         If found, that's our guess. Otherwise, fall back to name-based guess.
         """
         method_str = method_attr + "()"
-        candidate_classes = []
-        for cls in self.class_to_methods.keys():
-            method_list = self.class_to_methods[cls]
-            if method_str in method_list:
-                # print(cls)
-                # print("Class", cls)
-                # print("Method str:", method_str, "Method List:", method_list)
-                candidate_classes.append(cls)
-                # pprint(candidate_classes)
-                # print('------')        
-        
-        # print("Candidate Classes:", candidate_classes)
+        candidate_classes = list(self.method_to_classes.get(method_str, ()))
         self._add_to_connections(candidate_classes)
 
     def _refine_guess_from_attribute(self, var_name: str, attribute_name: str):
@@ -144,40 +173,99 @@ class ConnectionParser(ast.NodeVisitor):
         If exactly one class has that attribute, guess var_name is that class.
         Otherwise, fall back to name-based guess or any existing guess.
         """
-
-        candidate_classes = []
-        for cls, attr_list in self.class_to_attrs.items():
-            if attribute_name in attr_list:
-                # print(var_name, "is an object of class", cls)
-                # print("Class1:", self.current_class, "Method:", self.current_method, "Class2:", cls)
-                # print('------')
-                candidate_classes.append(cls)
-
+        candidate_classes = list(self.attr_to_classes.get(attribute_name, ()))
         self._add_to_connections(candidate_classes)
     
     def _add_to_connections(self, candidate_classes):
-        if len(candidate_classes) != 0 and [self.current_class, f"{self.current_method}()", candidate_classes] not in self.connections:
+        if len(candidate_classes) != 0 and (self.current_class, f"{self.current_method}()", tuple(candidate_classes)) not in self._connection_keys:
+            method = self.current_method + '()' if self.current_method != 'inherits' else self.current_method
+            self._connection_keys.add((self.current_class, method, tuple(candidate_classes)))
             return self.connections.append([
                 self.current_class,
-                self.current_method + '()' if self.current_method != 'inherits' else self.current_method,
+                method,
                 candidate_classes
             ])
 
+    def replay(self, facts: list) -> list:
+        """
+        Infer connections from facts recorded by ConnectionFactRecorder, using this
+        parser's class tables instead of walking a syntax tree.
+
+        Per-module state is reset first, so one parser and its indexes can serve
+        every module of a project.
+        """
+        self.known_classes = set(self.initial_known_classes)
+        self.connections = []
+        self._connection_keys = set()
+
+        for current_class, current_method, kind, name in facts:
+            self.current_class = current_class
+            self.current_method = current_method
+            if kind == 'inherits':
+                self._add_inheritance(name)
+            elif kind == 'call':
+                self._add_self_connection()
+            elif kind == 'constructor':
+                self._refine_guess_from_constructor(name)
+            elif kind == 'method':
+                self._refine_guess_from_method(None, name)
+            elif kind == 'attribute':
+                self._refine_guess_from_attribute(None, name)
 
-def extract_connection_triples(code_content: str, classes: list, class_to_methods=None, class_to_attrs=None):
+        self.current_class = None
+        self.current_method = None
+        return self.connections
+
+
+class ConnectionFactRecorder(ConnectionParser):
+    """
+    Walk a module like ConnectionParser, but record every class lookup as a
+    (class, method, kind, name) fact instead of resolving it.
+
+    Replaying the facts with ConnectionParser.replay against any class tables,
+    e.g. those of a whole project, gives the connections the module would have
+    with those tables, without parsing it again.
+    """
+
+    def __init__(self):
+        super().__init__([])
+        self.facts = []
+
+    def _record(self, kind: str, name: str = None):
+        self.facts.append((self.current_class, self.current_method, kind, name))
+
+    def _add_inheritance(self, base_name: str):
+        self._record('inherits', base_name)
+        self.current_method = 'inherits'
+
+    def _add_self_connection(self):
+        self._record('call')
+
+    def _refine_guess_from_constructor(self, class_name: str):
+        self._record('constructor', class_name)
+
+    def _refine_guess_from_method(self, var_name: str, method_attr: str):
+        self._record('method', method_attr)
+
+    def _refine_guess_from_attribute(self, var_name: str, attribute_name: str):
+        self._record('attribute', attribute_name)
+
+def extract_model_from_tree(tree: ast.AST) -> tuple:
     """
-    1. Parse the code into an AST.
-    2. Run a ConnectionFinder pass to discover relationships like:
-       ['Book', 'borrow()', 'Member'], etc.
-    3. Return the list of discovered connections.
+    Extract classes, methods, attributes and connections from an already parsed module.
+
+    The class tables are collected first, then a second, cheap walk over the same
+    tree infers the connections, so the source is read and parsed only once.
+
+    Returns:
+        tuple: (classes, class_to_methods, class_to_attributes, connections)
     """
-    try:
-        tree = ast.parse(code_content)
-    except SyntaxError as e:
-        log_error(f"Error parsing code for connection extraction: {e}")
-        return []
-
-    finder = ConnectionParser(classes, class_to_methods, class_to_attrs)
-    finder.visit(tree)
-    print(finder.connections)
-    return finder.connections
\ No newline at end of file
+    with span('PythonCodeVisitor', 'visit'):
+        code_visitor = PythonCodeVisitor()
+        code_visitor.visit(tree)
+        classes, class_to_methods, class_to_attributes = code_visitor.get_results()
+
+    with span('ConnectionParser', 'visit'):
+        finder = ConnectionParser(classes, class_to_methods, class_to_attributes)
+        finder.visit(tree)
+    return classes, class_to_methods, class_to_attributes, finder.connections
@@ -0,0 +1,178 @@
+# Edge kinds and their (style, color), as in the diagrams write_diagram generates.
+EDGE_STYLES = {
+    'call': ('solid', 'red'),
+    'assumed': ('dotted', 'black'),
+    'self': ('dashed', 'blue'),
+    'inherits': ('dashed', 'darkgreen'),
+}
+
+# Graph and node attributes of a `diagrams` Diagram(direction="LR") of C4 Containers.
+DOT_GRAPH_ATTRIBUTES = {
+    'fontname': 'Sans-Serif',
+    'fontsize': '30',
+    'labelloc': 't',
+    'nodesep': '0.60',
+    'pad': '2.0',
+    'rankdir': 'LR',
+    'ranksep': '0.75',
+    'splines': 'polyline',
+}
+DOT_NODE_ATTRIBUTES = {
+    'color': 'dodgerblue4',
+    'fillcolor': 'dodgerblue3',
+    'fontcolor': 'white',
+    'fontname': 'Sans-Serif',
+    'height': '1.6',
+    'shape': 'rect',
+    'style': 'rounded,filled',
+    'width': '2.6',
+}
+DOT_EDGE_ATTRIBUTES = {
+    'fontcolor': '#2D3436',
+    'fontname': 'Sans-Serif',
+    'fontsize': '13',
+}
+
+
+def diagram_title(diagram_name: str) -> str:
+    """Title of the diagram of a code file, e.g. 'src/animal_classes.py' -> 'animal classes.py'."""
+    return ' '.join(diagram_name.split('/')[-1].split('_'))
+
+
+def diagram_edges(class_to_methods: dict, connections: list):
+    """
+    Yield (from_class, label, to_class, kind) for every edge of a diagram, in write_diagram's order.
+
+    A connection to several classes (an assumed connection) gives one edge per class.
+    Methods without a connection become self edges.
+    """
+    connected_methods = set()
+    for from_cls, method, to_classes in connections:
+        connected_methods.add((from_cls, method))
+        if method == 'inherits':
+            kind = 'inherits'
+        elif len(to_classes) > 1:
+            kind = 'assumed'
+        else:
+            kind = 'call'
+        for to_cls in to_classes:
+            yield from_cls, method, to_cls, kind
+
+    for cls, methods in class_to_methods.items():
+        for method in methods:
+            if (cls, method) not in connected_methods:
+                yield cls, method, cls, 'self'
+
+
+def _dot_string(value: str) -> str:
+    """Quote a DOT string, escaping backslashes and quotes."""
+    if '\\' in value or '"' in value:
+        value = value.replace('\\', '\\\\').replace('"', '\\"')
+    return f'"{value}"'
+
+
+def _dot_attributes(attributes: dict) -> str:
+    return ', '.join(f"{name}={_dot_string(value)}" for name, value in attributes.items())
+
+
+def dot_source(diagram_name: str, classes: list, class_to_methods: dict, connections: list) -> str:
+    """Graphviz DOT text of the diagram write_diagram describes, with the same nodes, edges and styles."""
+    title = diagram_title(diagram_name)
+    lines = [
+        f"digraph {_dot_string(title)} {{",
+        f"    graph [{_dot_attributes({**DOT_GRAPH_ATTRIBUTES, 'label': title})}];",
+        f"    node [{_dot_attributes(DOT_NODE_ATTRIBUTES)}];",
+        f"    edge [{_dot_attributes(DOT_EDGE_ATTRIBUTES)}];",
+        "",
+    ]
+    node_ids = {cls: _dot_string(cls) for cls in classes}
+    lines.extend(f"    {node_id} [label={node_id}];" for node_id in node_ids.values())
+    lines.append("")
+
+    # Thousands of edges share a handful of styles and labels, so their text is built once.
+    style_attributes = {kind: f'style="{style}", color="{color}"' for kind, (style, color) in EDGE_STYLES.items()}
+    labels = {}
+    for from_cls, label, to_cls, kind in diagram_edges(class_to_methods, connections):
+        from_id = node_ids.get(from_cls) or node_ids.setdefault(from_cls, _dot_string(from_cls))
+        to_id = node_ids.get(to_cls) or node_ids.setdefault(to_cls, _dot_string(to_cls))
+        label_id = labels.get(label) or labels.setdefault(label, _dot_string(label))
+        lines.append(f"    {from_id} -> {to_id} [label={label_id}, {style_attributes[kind]}];")
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+
+# Mermaid classDiagram arrows per edge kind; Mermaid cannot color single class diagram edges.
+MERMAID_ARROWS = {
+    'call': '-->',
+    'assumed': '..>',
+    'self': '..>',
+    'inherits': '--|>',
+}
+
+
+def _mermaid_name(cls: str) -> str:
+    return cls if cls.isidentifier() else f"`{cls}`"
+
+
+def _class_bodies(classes: list, class_to_methods: dict, name, indent: str) -> list:
+    """Class declarations listing their methods, for Mermaid and PlantUML."""
+    lines = []
+    for cls in classes:
+        methods = class_to_methods.get(cls, [])
+        if not methods:
+            lines.append(f"{indent}class {name(cls)}")
+            continue
+        lines.append(f"{indent}class {name(cls)} {{")
+        lines.extend(f"{indent}    +{method}" for method in methods)
+        lines.append(f"{indent}}}")
+    return lines
+
+
+def mermaid_source(diagram_name: str, classes: list, class_to_methods: dict, connections: list) -> str:
+    """Mermaid classDiagram text with the classes, methods and edges of write_diagram's diagram."""
+    lines = [
+        "---",
+        f"title: {diagram_title(diagram_name)}",
+        "---",
+        "classDiagram",
+        "    direction LR",
+    ]
+    names = {cls: _mermaid_name(cls) for cls in classes}
+    lines.extend(_class_bodies(classes, class_to_methods, names.get, "    "))
+
+    for from_cls, label, to_cls, kind in diagram_edges(class_to_methods, connections):
+        from_name = names.get(from_cls) or names.setdefault(from_cls, _mermaid_name(from_cls))
+        to_name = names.get(to_cls) or names.setdefault(to_cls, _mermaid_name(to_cls))
+        lines.append(f"    {from_name} {MERMAID_ARROWS[kind]} {to_name} : {label}")
+    return "\n".join(lines) + "\n"
+
+
+# PlantUML arrows per edge kind, with the colors and line styles of the README conventions.
+PLANTUML_ARROWS = {
+    'call': '-[#red]->',
+    'assumed': '-[#black,dotted]->',
+    'self': '-[#blue,dashed]->',
+    'inherits': '-[#darkgreen,dashed]-|>',
+}
+
+
+def _plantuml_name(cls: str) -> str:
+    return cls if cls.isidentifier() else f'"{cls}"'
+
+
+def plantuml_source(diagram_name: str, classes: list, class_to_methods: dict, connections: list) -> str:
+    """PlantUML class diagram text with the classes, methods and edges of write_diagram's diagram."""
+    lines = [
+        "@startuml",
+        f"title {diagram_title(diagram_name)}",
+        "left to right direction",
+    ]
+    names = {cls: _plantuml_name(cls) for cls in classes}
+    lines.extend(_class_bodies(classes, class_to_methods, names.get, ""))
+
+    for from_cls, label, to_cls, kind in diagram_edges(class_to_methods, connections):
+        from_name = names.get(from_cls) or names.setdefault(from_cls, _plantuml_name(from_cls))
+        to_name = names.get(to_cls) or names.setdefault(to_cls, _plantuml_name(to_cls))
+        lines.append(f"{from_name} {PLANTUML_ARROWS[kind]} {to_name} : {label}")
+    lines.append("@enduml")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,506 @@
+import os
+import re
+from utils.inheritance import resolve_inherited_methods
+
+
+class DiagramSyntaxError(ValueError):
+    """Raised when a text diagram is not in the format its file extension names."""
+
+
+class DiagramModelBuilder:
+    """
+    Build the (classes, class_to_methods, connections, variable_mappings) model that
+    DiagramVisitor returns, from nodes and edges read from a text diagram.
+
+    The rules are DiagramVisitor's: an edge labelled 'inherits' (or drawn as
+    inheritance) makes its source inherit from its target, any other label is a
+    method of its source, and an edge between two different classes is also a
+    connection. Inherited methods are resolved once, in get_results().
+    """
+
+    def __init__(self):
+        # Dicts used as insertion-ordered sets, as in DiagramVisitor.
+        self.classes = {}
+        self.class_to_methods = {}
+        self.connections = []
+        self.variable_to_class = {}
+        self.class_to_parents = {}
+
+    def add_class(self, class_name: str, variable: str = None) -> None:
+        self.classes[class_name] = None
+        self.variable_to_class[variable or class_name] = class_name
+
+    def add_method(self, class_name: str, method: str) -> None:
+        self.class_to_methods.setdefault(class_name, {})[method] = None
+
+    def add_parent(self, class_name: str, parent: str) -> None:
+        self.class_to_parents.setdefault(class_name, {})[parent] = None
+
+    def add_edge(self, from_class: str, label: str, to_class: str, inherits: bool = False) -> None:
+        if inherits or label == 'inherits':
+            self.add_parent(from_class, to_class)
+            return
+        if not label:
+            return
+        # DiagramVisitor gives every target of a labelled edge a (possibly empty) method table.
+        self.class_to_methods.setdefault(to_class, {})
+        self.add_method(from_class, label)
+        if from_class != to_class:
+            self.connections.append([from_class, label, to_class])
+
+    def get_results(self) -> tuple:
+        for child, parents in self.class_to_parents.items():
+            if any(parent in self.class_to_methods for parent in parents):
+                self.class_to_methods.setdefault(child, {})
+        resolved = resolve_inherited_methods(self.class_to_methods, self.class_to_parents)
+        class_to_methods = {cls: list(methods) for cls, methods in self.class_to_methods.items()}
+        class_to_methods.update(resolved)
+        return list(self.classes), class_to_methods, self.connections, self.variable_to_class
+
+
+def _method_name(member: str):
+    """'+speak(loudly) bool' -> 'speak()', the form code parsers use; None for attributes."""
+    member = member.strip()
+    if '(' not in member:
+        return None
+    # Drop modifiers such as PlantUML's {abstract}, then visibility and any return type before the name.
+    member = re.sub(r'^\{\w+\}\s*', '', member).lstrip('+-#~ ')
+    words = member[:member.index('(')].split()
+    return f"{words[-1]}()" if words else None
+
+
+def _strip_label(label):
+    """Edge label without surrounding quotes and PlantUML reading-direction arrows."""
+    if label is None:
+        return None
+    label = label.strip().strip('<>').strip().strip('"').strip()
+    return label or None
+
+
+# ---------------------------------------------------------------- DOT
+
+def _nested_html(depth: int) -> str:
+    # Regular expressions cannot count, so HTML strings are matched up to a fixed nesting depth.
+    pattern = r'[^<>]*'
+    for _ in range(depth):
+        pattern = rf'(?:[^<>]|<{pattern}>)*'
+    return rf'<{pattern}>'
+
+
+# One match per token, skipping the whitespace and comments before it. Groups:
+# quoted string, punctuation, ID, HTML string, and any other character (an error).
+# The skipped prefix repeats single characters and whole comments only, so it can be
+# split in just one way, and the final `\Z` lets trailing whitespace match once
+# instead of being retried from every position.
+_DOT_TOKEN = re.compile(
+    r'(?:\s|//[^\n]*|/\*(?:[^*]|\*(?!/))*\*/|^\#[^\n]*)*'
+    r'(?:"((?:[^"\\]|\\.)*)"|(->|--|[\[\]{};,=:])'
+    r'|([A-Za-z_\x80-\U0010ffff][\w\x80-\U0010ffff]*|-?(?:\.\d+|\d+(?:\.\d*)?))'
+    rf'|({_nested_html(8)})|(\S)|\Z)',
+    re.S | re.M,
+)
+
+_DOT_KEYWORDS = {'graph', 'digraph', 'subgraph', 'node', 'edge', 'strict'}
+
+
+def _dot_tokens(text: str) -> list:
+    """
+    Split DOT text into (kind, value) tokens: kind is 'id' for every kind of DOT ID,
+    'keyword' for the (case-insensitive) keywords, and the punctuation itself otherwise.
+    """
+    tokens = []
+    for match in _DOT_TOKEN.finditer(text):
+        group = match.lastindex
+        if group is None:
+            break
+        value = match.group(group)
+        if group == 3:
+            lowered = value.lower()
+            tokens.append(('keyword', lowered) if lowered in _DOT_KEYWORDS else ('id', value))
+        elif group == 2:
+            tokens.append((value, value))
+        elif group == 1:
+            tokens.append(('id', value.replace('\\"', '"').replace('\\\n', '')))
+        elif group == 4:
+            # Only the text of an HTML label names a class, e.g. <<b>Dog</b>> -> Dog.
+            tokens.append(('id', re.sub(r'<[^>]*>', '', value[1:-1]).strip()))
+        else:
+            raise DiagramSyntaxError(f"unexpected {value!r} in DOT text")
+    return tokens
+
+
+def read_dot(text: str) -> tuple:
+    """
+    Read a Graphviz DOT graph in one pass over its tokens.
+
+    Nodes are classes, named by their label (or ID). Edges carry methods in their
+    label; `dir=back` reverses an edge. Subgraphs, ports and attribute statements
+    are accepted and ignored.
+    """
+    tokens = _dot_tokens(text)
+    tokens.append((None, None))
+    position = 0
+
+    def keyword(index):
+        kind, value = tokens[index]
+        return value if kind == 'keyword' else None
+
+    if keyword(position) == 'strict':
+        position += 1
+    if keyword(position) not in ('graph', 'digraph'):
+        raise DiagramSyntaxError("a DOT file must start with 'graph' or 'digraph'")
+    position += 1
+    if tokens[position][0] == 'id':
+        position += 1
+    if tokens[position][0] != '{':
+        raise DiagramSyntaxError("expected '{' after the graph name")
+    position += 1
+
+    # Index of the '}' closing every '{', so groups and subgraph bodies are told apart without rescanning.
+    closing = {}
+    opened = []
+    for index, (kind, _) in enumerate(tokens):
+        if kind == '{':
+            opened.append(index)
+        elif kind == '}' and opened:
+            closing[opened.pop()] = index
+
+    def attribute_lists(index):
+        attributes = {}
+        while tokens[index][0] == '[':
+            index += 1
+            while tokens[index][0] not in (']', None):
+                kind, name = tokens[index]
+                if kind == 'id' and tokens[index + 1][0] == '=':
+                    attributes[name] = tokens[index + 2][1]
+                    index += 3
+                else:
+                    index += 1
+            index += 1
+        return attributes, index
+
+    def group_start(index):
+        """Index of the '{' of a subgraph or anonymous group starting at `index`, or None."""
+        if keyword(index) == 'subgraph':
+            index += 1
+            if tokens[index][0] == 'id':
+                index += 1
+        return index if tokens[index][0] == '{' else None
+
+    def operand(index):
+        """Node IDs of an edge operand: a node (with an optional port) or a { ... } group."""
+        brace = group_start(index)
+        if brace is not None:
+            end = closing.get(brace, len(tokens) - 1)
+            nodes = []
+            in_attributes = False
+            for inner in range(brace + 1, end):
+                kind, value = tokens[inner]
+                if kind in ('[', ']'):
+                    in_attributes = kind == '['
+                elif (kind == 'id' and not in_attributes
+                      and tokens[inner + 1][0] != '=' and tokens[inner - 1][0] not in ('=', ':')):
+                    nodes.append(value)
+            return nodes, end + 1
+        if tokens[index][0] != 'id':
+            raise DiagramSyntaxError(f"unexpected {tokens[index][1]!r}")
+        nodes = [tokens[index][1]]
+        index += 1
+        while tokens[index][0] == ':':
+            index += 2
+        return nodes, index
+
+    # Nodes may be used before their label is known, so edges are resolved at the end.
+    labels = {}
+    node_ids = {}
+    edges = []
+    while tokens[position][0] is not None:
+        kind, value = tokens[position]
+        if kind in ('}', ';', ','):
+            position += 1
+            continue
+        brace = group_start(position) if kind != 'id' else None
+        if brace is not None and tokens[closing.get(brace, -1) + 1][0] not in ('->', '--'):
+            # A subgraph body: its statements are read like the graph's.
+            position = brace + 1
+            continue
+        if keyword(position) in ('graph', 'node', 'edge') and tokens[position + 1][0] == '[':
+            _, position = attribute_lists(position + 1)
+            continue
+        if kind == 'id' and tokens[position + 1][0] == '=':
+            position += 3
+            continue
+
+        chain = []
+        nodes, position = operand(position)
+        chain.append(nodes)
+        while tokens[position][0] in ('->', '--'):
+            nodes, position = operand(position + 1)
+            chain.append(nodes)
+        attributes, position = attribute_lists(position)
+
+        for nodes in chain:
+            node_ids.update(dict.fromkeys(nodes))
+        if len(chain) == 1:
+            if 'label' in attributes:
+                for node in chain[0]:
+                    labels[node] = attributes['label']
+            continue
+        reverse = attributes.get('dir') == 'back'
+        for sources, targets in zip(chain, chain[1:]):
+            if reverse:
+                sources, targets = targets, sources
+            for source in sources:
+                for target in targets:
+                    edges.append((source, attributes.get('label'), target))
+
+    builder = DiagramModelBuilder()
+    for node in node_ids:
+        builder.add_class(labels.get(node) or node, node)
+    for source, label, target in edges:
+        builder.add_edge(builder.variable_to_class[source], label, builder.variable_to_class[target])
+    return builder.get_results()
+
+
+# ------------------------------------------------------------ Mermaid
+
+_MERMAID_NAME = r'`[^`]+`|[\w$]+(?:~[^~]*~)?'
+_MERMAID_RELATION = re.compile(
+    rf'^(?P<left>{_MERMAID_NAME})\s*(?:"[^"]*"\s*)?'
+    r'(?P<head1><\||[<*o])?(?P<line>--|\.\.)(?P<head2>\|>|[>*o])?'
+    rf'\s*(?:"[^"]*"\s*)?(?P<right>{_MERMAID_NAME})\s*(?::(?P<label>.*))?$'
+)
+_MERMAID_CLASS = re.compile(rf'^class\s+(?P<name>{_MERMAID_NAME})(?P<rest>.*)$')
+_MERMAID_MEMBER = re.compile(rf'^(?P<name>{_MERMAID_NAME})\s*:(?P<member>.*)$')
+_MERMAID_SKIPPED = ('direction', 'note', 'style', 'classDef', 'cssClass', 'click', 'link', 'callback', '<<')
+
+
+def _mermaid_class(name: str) -> str:
+    """'`My Class`' -> 'My Class', 'List~int~' -> 'List'."""
+    if name.startswith('`'):
+        return name[1:-1]
+    return name.split('~', 1)[0]
+
+
+def read_mermaid(text: str) -> tuple:
+    """
+    Read a Mermaid classDiagram line by line.
+
+    Methods come from class bodies, `Class : member` lines and relation labels;
+    `<|--` and `--|>` are inheritance, and an arrow head on the left reverses a relation.
+    """
+    builder = DiagramModelBuilder()
+    lines = iter(text.splitlines())
+    started = False
+    body_class = None
+    namespaces = 0
+
+    for line in lines:
+        line = line.split('%%', 1)[0].strip()
+        if not line:
+            continue
+        if not started:
+            if line == '---':
+                # Front matter, e.g. the title.
+                for line in lines:
+                    if line.strip() == '---':
+                        break
+                continue
+            if line.split()[0] not in ('classDiagram', 'classDiagram-v2'):
+                raise DiagramSyntaxError("a Mermaid class diagram must start with 'classDiagram'")
+            started = True
+            continue
+
+        if body_class is not None:
+            if line.startswith('}'):
+                body_class = None
+            elif not line.startswith('<<'):
+                method = _method_name(line)
+                if method:
+                    builder.add_method(body_class, method)
+            continue
+
+        if line.startswith('namespace ') and line.endswith('{'):
+            namespaces += 1
+            continue
+        if line == '}' and namespaces:
+            namespaces -= 1
+            continue
+
+        match = _MERMAID_CLASS.match(line)
+        if match:
+            class_name = _mermaid_class(match.group('name'))
+            builder.add_class(class_name)
+            if match.group('rest').rstrip().endswith('{'):
+                body_class = class_name
+            continue
+
+        match = _MERMAID_RELATION.match(line)
+        if match:
+            left, right = _mermaid_class(match.group('left')), _mermaid_class(match.group('right'))
+            head1, head2 = match.group('head1') or '', match.group('head2') or ''
+            builder.add_class(left)
+            builder.add_class(right)
+            if head1 == '<|' or (head1 == '<' and not head2):
+                left, right = right, left
+            builder.add_edge(left, _strip_label(match.group('label')), right, inherits='|' in head1 + head2)
+            continue
+
+        if line.startswith(_MERMAID_SKIPPED):
+            continue
+        match = _MERMAID_MEMBER.match(line)
+        if match:
+            class_name = _mermaid_class(match.group('name'))
+            builder.add_class(class_name)
+            method = _method_name(match.group('member'))
+            if method:
+                builder.add_method(class_name, method)
+
+    if not started:
+        raise DiagramSyntaxError("a Mermaid class diagram must start with 'classDiagram'")
+    return builder.get_results()
+
+
+# ----------------------------------------------------------- PlantUML
+
+_PLANTUML_NAME = r'"[^"]+"|[\w$]+(?:\.[\w$]+)*'
+# The line between the heads is one run of '-' and '.', or two runs around a [color]
+# and/or direction, so each '-' or '.' can only belong to one part of the arrow.
+_PLANTUML_ARROW = (
+    r'[<*o+#x}^|]*[-.]+'
+    r'(?:(?:\[[^\]]*\](?:up|down|left|right|le|ri|do|u|d|l|r)?|(?:up|down|left|right|le|ri|do|u|d|l|r))[-.]*)?'
+    r'[>*o+#x{^|]*'
+)
+# The left name is matched atomically (a lookahead capture, then a backreference), so
+# the dots of a dotted name are never handed back to the arrow, which would make long
+# lines quadratic.
+_PLANTUML_RELATION = re.compile(
+    rf'^(?=(?P<left>{_PLANTUML_NAME}))(?P=left)\s*(?:"[^"]*"\s*)?(?P<arrow>{_PLANTUML_ARROW})'
+    rf'\s*(?:"[^"]*"\s*)?(?P<right>{_PLANTUML_NAME})\s*(?::(?P<label>.*))?$'
+)
+_PLANTUML_CLASS = re.compile(
+    r'^(?:abstract\s+class|abstract|class|interface|enum|annotation|entity|protocol|struct|exception)\s+'
+    rf'(?P<name>{_PLANTUML_NAME})(?:\s+as\s+(?P<alias>{_PLANTUML_NAME}))?(?P<rest>.*)$'
+)
+_PLANTUML_MEMBER = re.compile(rf'^(?P<name>{_PLANTUML_NAME})\s*:(?P<member>.*)$')
+_PLANTUML_BLOCK = re.compile(r'^(?P<kind>note|legend)\b\s*(?P<rest>.*)$', re.I)
+_PLANTUML_PARENTS = re.compile(r'\b(?:extends|implements)\s+([\w$.,\s"]+?)(?=\s*(?:\b(?:extends|implements)\b|\{|$))')
+
+
+def read_plantuml(text: str) -> tuple:
+    """
+    Read a PlantUML class diagram line by line.
+
+    Methods come from class bodies, `Class : member` lines and relation labels;
+    `<|--`, `--|>`, `extends` and `implements` are inheritance, and an arrow head
+    on the left only reverses a relation. Arrow colors and directions are ignored.
+    """
+    builder = DiagramModelBuilder()
+    aliases = {}
+    body_class = None
+    block_end = None
+    in_comment = False
+    notes = set()
+
+    def class_of(name: str) -> str:
+        name = name.strip('"')
+        return aliases.get(name, name)
+
+    for line in text.splitlines():
+        line = line.strip()
+        if in_comment:
+            in_comment = "'/" not in line
+            continue
+        if block_end:
+            if line.lower().startswith(block_end):
+                block_end = None
+            continue
+        if not line or line.startswith("'"):
+            continue
+        if line.startswith("/'"):
+            in_comment = "'/" not in line[2:]
+            continue
+        if line.startswith('@'):
+            continue
+
+        if body_class is not None:
+            if line.startswith('}'):
+                body_class = None
+            elif line[:2] not in ('--', '..', '==', '__'):
+                method = _method_name(line)
+                if method:
+                    builder.add_method(body_class, method)
+            continue
+
+        match = _PLANTUML_BLOCK.match(line)
+        if match:
+            # `note left of A : text` and the floating `note "text" as N1` are single lines;
+            # other notes and legends run until their end line.
+            rest = match.group('rest')
+            if ':' not in line and not rest.startswith('"'):
+                block_end = 'end' if match.group('kind').lower() == 'note' else 'endlegend'
+            # A named note (`note "text" as N1`, `note as N1`) may be linked to classes; it is not one.
+            note = re.search(r'\bas\s+([\w$]+)$', rest)
+            if note:
+                notes.add(note.group(1))
+            continue
+
+        match = _PLANTUML_CLASS.match(line)
+        if match:
+            name, alias = match.group('name'), match.group('alias')
+            if alias and alias.startswith('"'):
+                name, alias = alias, name
+            class_name = name.strip('"')
+            variable = alias.strip('"') if alias else class_name
+            aliases[variable] = class_name
+            builder.add_class(class_name, variable)
+            rest = match.group('rest')
+            for parents in _PLANTUML_PARENTS.findall(rest):
+                for parent in parents.split(','):
+                    if parent.strip():
+                        builder.add_parent(class_name, class_of(parent.strip()))
+            if rest.rstrip().endswith('{') and '}' not in rest:
+                body_class = class_name
+            continue
+
+        match = _PLANTUML_RELATION.match(line)
+        if match:
+            if match.group('left') in notes or match.group('right') in notes:
+                continue
+            left, right = class_of(match.group('left')), class_of(match.group('right'))
+            arrow = match.group('arrow')
+            head1 = re.match(r'[<*o+#x}^|]*', arrow).group()
+            head2 = re.search(r'[>*o+#x{^|]*$', arrow).group()
+            builder.add_class(left)
+            builder.add_class(right)
+            if '<' in head1 and '>' not in head2:
+                left, right = right, left
+            builder.add_edge(left, _strip_label(match.group('label')), right, inherits='|' in head1 + head2)
+            continue
+
+        match = _PLANTUML_MEMBER.match(line)
+        if match:
+            class_name = class_of(match.group('name'))
+            builder.add_class(class_name)
+            method = _method_name(match.group('member'))
+            if method:
+                builder.add_method(class_name, method)
+
+    return builder.get_results()
+
+
+# Text diagram readers by file extension: (parse cache kind suffix, reader).
+DIAGRAM_READERS = {
+    '.dot': ('dot', read_dot),
+    '.gv': ('dot', read_dot),
+    '.mmd': ('mermaid', read_mermaid),
+    '.mermaid': ('mermaid', read_mermaid),
+    '.puml': ('plantuml', read_plantuml),
+    '.plantuml': ('plantuml', read_plantuml),
+    '.pu': ('plantuml', read_plantuml),
+}
+
+
+def diagram_reader(file_path: str):
+    """The (format, reader) of a text diagram file, or None for `diagrams` Python code."""
+    return DIAGRAM_READERS.get(os.path.splitext(file_path)[1].lower())
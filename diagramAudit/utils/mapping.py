@@ -0,0 +1,98 @@
+import json
+
+DEFAULT_MAPPING_FILE = 'code_diagram_mapping.json'
+
+
+def normalize_path(file_path: str) -> str:
+    """Strip a leading './' so paths match the keys used in the mapping file."""
+    while file_path.startswith('./'):
+        file_path = file_path[2:]
+    return file_path
+
+
+def load_mapping(mapping_file: str = DEFAULT_MAPPING_FILE) -> list:
+    """
+    Load the code-to-diagram mapping.
+
+    Args:
+        mapping_file: Path to the JSON mapping file.
+
+    Returns:
+        list: [(code_files, diagram_files), ...] groups, see parse_mapping.
+    """
+    with open(mapping_file, 'r') as f:
+        return parse_mapping(f.read(), mapping_file)
+
+
+def _file_list(value, mapping_file: str) -> tuple:
+    """Accept a path or a non-empty list of paths and return them normalized, without duplicates."""
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, list) or not value or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"Mapping file {mapping_file}: expected a path or a non-empty list of paths, got {value!r}.")
+    return tuple(dict.fromkeys(normalize_path(item) for item in value))
+
+
+def parse_mapping(content, mapping_file: str = DEFAULT_MAPPING_FILE) -> list:
+    """
+    Parse the JSON text of a mapping file, e.g. a blob read from the git index.
+
+    Two layouts are accepted:
+      - an object mapping each code file to a diagram file or a list of diagram files,
+        e.g. { "a.py": "a_diagram.py", "b.py": ["b_classes.py", "b_calls.py"] }
+      - a list of groups with one or more files on each side,
+        e.g. [ { "code": ["a.py", "b.py"], "diagram": "ab_diagram.py" } ]
+
+    Args:
+        content: JSON text as str or bytes.
+        mapping_file: Name used in error messages.
+
+    Returns:
+        list: [(code_files, diagram_files), ...] groups of normalized path tuples, in file order.
+    """
+    raw_mapping = json.loads(content)
+
+    if isinstance(raw_mapping, dict):
+        return [
+            ((normalize_path(code),), _file_list(diagrams, mapping_file))
+            for code, diagrams in raw_mapping.items()
+        ]
+
+    if isinstance(raw_mapping, list):
+        groups = []
+        for group in raw_mapping:
+            if not isinstance(group, dict) or 'code' not in group or 'diagram' not in group:
+                raise ValueError(f"Mapping file {mapping_file}: every group needs 'code' and 'diagram' entries.")
+            groups.append((_file_list(group['code'], mapping_file), _file_list(group['diagram'], mapping_file)))
+        return groups
+
+    raise ValueError(f"Mapping file {mapping_file} must contain a JSON object or a list of groups.")
+
+
+def build_reverse_index(groups: list) -> dict:
+    """
+    Index every mapped file to the groups that use it: { file_path: [group, ...] }.
+
+    A diagram therefore leads to every code file it describes, so a diagram change
+    can be traced to all of its dependents without scanning the whole mapping.
+    Groups keep their order in the mapping.
+    """
+    reverse_index = {}
+    for group in groups:
+        code_files, diagram_files = group
+        for file_path in dict.fromkeys(code_files + diagram_files):
+            reverse_index.setdefault(file_path, []).append(group)
+    return reverse_index
+
+
+def dependent_groups(reverse_index: dict, changed_files) -> list:
+    """
+    Return the groups affected by the changed files, each group once.
+
+    A changed file, code or diagram, schedules every group it belongs to.
+    """
+    groups = {}
+    for file_path in changed_files:
+        for group in reverse_index.get(file_path, ()):
+            groups[group] = None
+    return list(groups)
@@ -0,0 +1,325 @@
+import ast
+import os
+from utils.connection_parser import ConnectionFactRecorder, ConnectionParser
+from utils.inheritance import resolve_inherited_methods
+from utils.logging_utils import log_warning
+from utils.parse_cache import cached_parse
+from utils.python_code_parser import PythonCodeVisitor
+from utils.tracing import span
+from utils.workers import map_in_workers
+
+SKIPPED_DIRS = {'.git', '.hg', '.svn', '.tox', '.venv', 'venv', '__pycache__', 'node_modules', 'vendor'}
+
+# Re-exports are followed at most this many imports deep, which also stops import cycles.
+MAX_IMPORT_DEPTH = 16
+
+
+def _dotted_name(node: ast.AST):
+    """Return 'a.b.C' for a Name/Attribute chain, or None for any other expression."""
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return '.'.join(reversed(parts))
+
+
+class ModuleSummaryVisitor(PythonCodeVisitor):
+    """
+    Collect a module's own classes, methods and attributes, its parent class
+    expressions as written (e.g. 'models.Base') and its imports.
+
+    Nothing is resolved here: inheritance and imports can only be resolved once
+    every module of the project has been summarized.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # [local_name, module, imported_name, level]; imported_name is None for `import x`.
+        self.imports = []
+
+    def _extract_parents(self, node: ast.ClassDef) -> list:
+        return [name for name in map(_dotted_name, node.bases) if name]
+
+    def visit_Import(self, node: ast.Import) -> None:
+        for alias in node.names:
+            if alias.asname:
+                self.imports.append((alias.asname, alias.name, None, 0))
+            else:
+                # `import a.b` binds `a`
+                top_level = alias.name.split('.')[0]
+                self.imports.append((top_level, top_level, None, 0))
+
+    def visit_ImportFrom(self, node: ast.ImportFrom) -> None:
+        for alias in node.names:
+            self.imports.append((alias.asname or alias.name, node.module or '', alias.name, node.level))
+
+
+def summarize_python_source(content) -> tuple:
+    """
+    Map step: summarize one module from a single parse.
+
+    Args:
+        content: Source code as str or bytes.
+
+    Returns:
+        tuple: (classes, own_methods, attributes, parents, imports, connection_facts)
+
+    Raises:
+        SyntaxError: If the source cannot be parsed.
+    """
+    with span('ast.parse', 'parse'):
+        tree = ast.parse(content)
+
+    with span('ModuleSummaryVisitor', 'visit'):
+        summary_visitor = ModuleSummaryVisitor()
+        summary_visitor.visit(tree)
+    with span('ConnectionFactRecorder', 'visit'):
+        recorder = ConnectionFactRecorder()
+        recorder.visit(tree)
+
+    return (
+        summary_visitor.classes,
+        summary_visitor.class_to_methods,
+        summary_visitor.class_to_attributes,
+        summary_visitor.class_to_parents,
+        summary_visitor.imports,
+        recorder.facts,
+    )
+
+
+def _summarize_file(file_path: str):
+    """Summarize a file, returning an error message instead of raising so it is safe in pool workers."""
+    with span('summarize module', 'file', file=file_path):
+        try:
+            with span('read', 'io', file=file_path), open(file_path, 'rb') as f:
+                content = f.read()
+            return cached_parse('python_summary', content, lambda: summarize_python_source(content))
+        except (OSError, SyntaxError, ValueError) as e:
+            return str(e)
+
+
+def find_python_files(root: str) -> list:
+    """List every .py file under `root` in a stable order, skipping VCS, cache and virtualenv directories."""
+    files = []
+    for directory, subdirectories, file_names in os.walk(root):
+        subdirectories[:] = sorted(name for name in subdirectories if name not in SKIPPED_DIRS)
+        files.extend(os.path.join(directory, name) for name in sorted(file_names) if name.endswith('.py'))
+    return files
+
+
+def module_name(root: str, file_path: str) -> str:
+    """Dotted module name of a file relative to the project root, e.g. 'pkg/models/__init__.py' -> 'pkg.models'."""
+    parts = os.path.relpath(file_path, root)[:-len('.py')].split(os.sep)
+    if parts[-1] == '__init__':
+        parts.pop()
+    return '.'.join(parts)
+
+
+def _qualify(module: str, name: str) -> str:
+    return f"{module}.{name}" if module else name
+
+
+class ProjectIndex:
+    """
+    Project-wide table of classes, methods and attributes built from per-module summaries.
+
+    Classes are keyed by qualified name ('pkg.models.User') so that equally named
+    classes in different modules stay apart. Parent classes are resolved through
+    each module's imports, including relative imports, re-exports and star imports,
+    and inherited methods are then resolved across modules in one pass.
+    """
+
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        self.path_to_module = {}
+        self.module_summaries = {}
+        self.class_to_parents = {}
+        self.class_to_methods = {}
+        self._own_methods = {}
+        self._imports = {}
+        self._star_imports = {}
+        self._module_suffixes = {}
+        self._connection_parser = None
+
+    def add_module(self, file_path: str, summary: tuple) -> None:
+        """Merge one module summary from summarize_python_source into the index."""
+        module = module_name(self.root, file_path)
+        self.path_to_module[os.path.abspath(file_path)] = module
+        self.module_summaries[module] = summary
+
+        classes, own_methods, _, _, imports, _ = summary
+        for class_name in classes:
+            self._own_methods[_qualify(module, class_name)] = own_methods.get(class_name, [])
+
+        is_package = os.path.basename(file_path) == '__init__.py'
+        package = module if is_package else module.rpartition('.')[0]
+        module_imports = {}
+        star_imports = []
+        for local_name, imported_module, imported_name, level in imports:
+            if level:
+                # `from . import x` is relative to the package, each extra dot goes one package up.
+                base = package.split('.') if package else []
+                base = base[:len(base) - (level - 1)]
+                imported_module = '.'.join(base + ([imported_module] if imported_module else []))
+            if imported_name is None:
+                module_imports[local_name] = imported_module
+            elif imported_name == '*':
+                star_imports.append(imported_module)
+            else:
+                module_imports[local_name] = _qualify(imported_module, imported_name)
+        self._imports[module] = module_imports
+        self._star_imports[module] = star_imports
+
+    def resolve(self) -> None:
+        """Reduce step: resolve parent classes through imports, then inherited methods across modules."""
+        self._module_suffixes = {}
+        for module in self.module_summaries:
+            parts = module.split('.')
+            for start in range(1, len(parts)):
+                suffix = '.'.join(parts[start:])
+                # A suffix shared by several modules is ambiguous and never used.
+                self._module_suffixes[suffix] = None if suffix in self._module_suffixes else module
+
+        self.class_to_parents = {}
+        for module, summary in self.module_summaries.items():
+            classes, _, _, parents, _, _ = summary
+            for class_name in classes:
+                resolved_parents = []
+                for parent in parents.get(class_name, []):
+                    qualified_parent = self.resolve_name(module, parent)
+                    if qualified_parent is not None:
+                        resolved_parents.append(qualified_parent)
+                self.class_to_parents[_qualify(module, class_name)] = resolved_parents
+
+        self.class_to_methods = resolve_inherited_methods(self._own_methods, self.class_to_parents)
+        self._connection_parser = None
+
+    def resolve_name(self, module: str, dotted_name: str, depth: int = 0):
+        """
+        Resolve a class name as written in `module` (e.g. 'Base' or 'models.Base') to its qualified name.
+
+        Returns:
+            str: The qualified class name, or None if it is not a class of this project.
+        """
+        if depth > MAX_IMPORT_DEPTH:
+            return None
+
+        local_name = _qualify(module, dotted_name)
+        if local_name in self._own_methods:
+            return local_name
+
+        head, _, rest = dotted_name.partition('.')
+        target = self._imports.get(module, {}).get(head)
+        if target is not None:
+            return self._lookup(f"{target}.{rest}" if rest else target, depth + 1)
+
+        for star_module in self._star_imports.get(module, ()):
+            qualified = self._lookup(_qualify(star_module, dotted_name), depth + 1)
+            if qualified is not None:
+                return qualified
+        return None
+
+    def _lookup(self, qualified_name: str, depth: int):
+        """Find a class by qualified name, following re-exports of the module that should define it."""
+        if qualified_name in self._own_methods:
+            return qualified_name
+
+        module, _, name = qualified_name.rpartition('.')
+        if module not in self.module_summaries:
+            # Imports written relative to a source directory deeper than the project
+            # root, e.g. `utils.models` for 'src/utils/models.py'.
+            module = self._module_suffixes.get(module)
+            if module is None:
+                return None
+            if _qualify(module, name) in self._own_methods:
+                return _qualify(module, name)
+        return self.resolve_name(module, name, depth)
+
+    def module_for(self, file_path: str):
+        """Module name of an indexed file, or None if the file is not part of the project."""
+        return self.path_to_module.get(os.path.abspath(file_path))
+
+    def code_model(self, file_path: str):
+        """
+        The model of one indexed module, with methods inherited from any module of the project.
+
+        Returns:
+            tuple: (classes, methods, attributes) like parse_python, or None if the file is not indexed.
+        """
+        module = self.module_for(file_path)
+        if module is None:
+            return None
+        classes, _, attributes, _, _, _ = self.module_summaries[module]
+        class_to_methods = {class_name: self.class_to_methods[_qualify(module, class_name)] for class_name in classes}
+        return classes, class_to_methods, attributes
+
+    def connections(self, file_path: str):
+        """
+        Connections of one indexed module, inferred against the classes of the whole project.
+
+        The module is not parsed again: its recorded connection facts are replayed.
+
+        Returns:
+            list: [[class, method, [candidate classes]], ...], or None if the file is not indexed.
+        """
+        module = self.module_for(file_path)
+        if module is None:
+            return None
+        if self._connection_parser is None:
+            self._connection_parser = ConnectionParser(*self._project_tables())
+        return self._connection_parser.replay(self.module_summaries[module][5])
+
+    def _project_tables(self) -> tuple:
+        """Classes, methods and attributes of every module keyed by plain class name, as ConnectionParser expects."""
+        classes = {}
+        class_to_methods = {}
+        class_to_attributes = {}
+        for module, summary in self.module_summaries.items():
+            module_classes, _, attributes, _, _, _ = summary
+            for class_name in module_classes:
+                classes[class_name] = None
+                class_to_methods.setdefault(class_name, {}).update(
+                    dict.fromkeys(self.class_to_methods[_qualify(module, class_name)])
+                )
+            for class_name, class_attributes in attributes.items():
+                class_to_attributes.setdefault(class_name, {}).update(dict.fromkeys(class_attributes))
+        return (
+            list(classes),
+            {class_name: list(methods) for class_name, methods in class_to_methods.items()},
+            {class_name: list(members) for class_name, members in class_to_attributes.items()},
+        )
+
+
+def build_project_index(root: str, jobs: int = None) -> ProjectIndex:
+    """
+    Index every Python module under `root`.
+
+    Each file is summarized once (map), in parallel worker processes when `jobs`
+    is above 1, and the summaries are then merged and resolved in this process
+    (reduce). Summaries go through the parse cache, so unchanged files are not
+    parsed again on the next run. Files that cannot be parsed are reported and skipped.
+
+    Args:
+        root: Project source root; module names are relative to it.
+        jobs: Number of worker processes. 1 indexes in this process; None uses all CPUs.
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    files = find_python_files(root)
+    jobs = max(1, min(jobs, len(files)))
+    summaries = map_in_workers(_summarize_file, [(file_path,) for file_path in files], jobs)
+
+    index = ProjectIndex(root)
+    with span('project index map', 'index', files=len(files), jobs=jobs):
+        for file_path, summary in zip(files, summaries):
+            if isinstance(summary, str):
+                log_warning(f"Skipping {file_path} in project index: {summary}")
+            else:
+                index.add_module(file_path, summary)
+
+    with span('project index reduce', 'index', modules=len(index.module_summaries)):
+        index.resolve()
+    return index
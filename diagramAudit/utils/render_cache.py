@@ -0,0 +1,99 @@
+import functools
+import hashlib
+import json
+import os
+import subprocess
+import tempfile
+from importlib import metadata
+from utils.parse_cache import RENDER_DIR, STAMP_SUFFIX, get_cache
+
+
+@functools.lru_cache(maxsize=None)
+def renderer_version() -> str:
+    """Versions of the `diagrams` package and of Graphviz, which together decide what a render looks like."""
+    try:
+        diagrams_version = metadata.version('diagrams')
+    except metadata.PackageNotFoundError:
+        diagrams_version = 'none'
+    try:
+        # `dot -V` prints e.g. "dot - graphviz version 2.43.0 (0)" on stderr.
+        completed = subprocess.run(['dot', '-V'], capture_output=True, text=True)
+        graphviz_version = (completed.stderr or completed.stdout).strip()
+    except OSError:
+        graphviz_version = 'none'
+    return f"diagrams {diagrams_version}; {graphviz_version}"
+
+
+def render_key(source: str) -> str:
+    """Hash of a generated diagram source and the renderer version."""
+    digest = hashlib.sha256()
+    digest.update(f"{renderer_version()}\0".encode())
+    digest.update(source.encode())
+    return digest.hexdigest()
+
+
+class RenderCache:
+    """
+    Remember which generated source each rendered image was produced from.
+
+    A stamp per image path records the render key and the image's size and mtime,
+    so a render is skipped only while that exact image is still on disk. Stamps live
+    in the parse cache directory, which evicts and clears them with its entries;
+    reads refresh a stamp's mtime to keep that eviction least-recently-used.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.render_dir = os.path.join(cache.cache_dir, RENDER_DIR)
+
+    def _stamp_path(self, image_path: str) -> str:
+        name = hashlib.sha256(os.path.abspath(image_path).encode()).hexdigest()
+        return os.path.join(self.render_dir, name + STAMP_SUFFIX)
+
+    @staticmethod
+    def _image_state(image_path: str):
+        try:
+            stat = os.stat(image_path)
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def is_current(self, image_path: str, key: str) -> bool:
+        """Whether `image_path` exists and was rendered from the source with this key."""
+        stamp_path = self._stamp_path(image_path)
+        try:
+            with open(stamp_path) as f:
+                stamp = json.load(f)
+        except (OSError, ValueError):
+            return False
+        image_state = self._image_state(image_path)
+        if image_state is None or stamp != {'key': key, 'image': image_state}:
+            return False
+        try:
+            os.utime(stamp_path)
+        except OSError:
+            pass
+        return True
+
+    def record(self, image_path: str, key: str) -> None:
+        """Stamp a freshly rendered image with the key of its source."""
+        image_state = self._image_state(image_path)
+        if image_state is None:
+            return
+        try:
+            os.makedirs(self.render_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.render_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                size = f.write(json.dumps({'key': key, 'image': image_state}))
+            os.replace(tmp_path, self._stamp_path(image_path))
+        except OSError:
+            return
+        self.cache.note_write(size)
+
+
+def get_render_cache():
+    """A RenderCache in the parse cache directory, or None when caching is disabled (--no-cache)."""
+    cache = get_cache()
+    if cache is None:
+        return None
+    return RenderCache(cache)
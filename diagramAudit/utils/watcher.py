@@ -0,0 +1,168 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+
+# inotify(7) constants
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+# Editors often write a file in several steps; events that arrive within this
+# window after the first one are reported together.
+DEBOUNCE_SECONDS = 0.05
+
+
+class PollingWatcher:
+    """Detect file changes by comparing os.stat() results at a fixed interval."""
+
+    def __init__(self, paths, interval: float = 0.5):
+        self.interval = interval
+        self.paths = set()
+        self._stats = {}
+        self.add(paths)
+
+    @staticmethod
+    def _stat(path: str):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def add(self, paths) -> None:
+        """Start watching more files."""
+        for path in paths:
+            if path not in self.paths:
+                self.paths.add(path)
+                self._stats[path] = self._stat(path)
+
+    def wait(self, timeout: float = None) -> set:
+        """Block until at least one watched file changes, or `timeout` seconds pass."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = set()
+            for path in self.paths:
+                stat = self._stat(path)
+                if stat != self._stats[path]:
+                    self._stats[path] = stat
+                    changed.add(path)
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            time.sleep(self.interval)
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """
+    Detect file changes with Linux inotify.
+
+    The parent directory of every file is watched rather than the file itself, so
+    editors that save by writing a new file and renaming it over the old one are
+    still noticed.
+    """
+
+    def __init__(self, paths):
+        self._libc = _load_libc()
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.paths = set()
+        self._watched_dirs = {}
+        self._wd_to_dir = {}
+        self._abs_to_path = {}
+        self.add(paths)
+
+    def add(self, paths) -> None:
+        """Start watching more files."""
+        for path in paths:
+            if path in self.paths:
+                continue
+            abs_path = os.path.abspath(path)
+            directory = os.path.dirname(abs_path)
+            if directory not in self._watched_dirs:
+                wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+                if wd < 0:
+                    raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+                self._watched_dirs[directory] = wd
+                self._wd_to_dir[wd] = directory
+            self.paths.add(path)
+            self._abs_to_path[abs_path] = path
+
+    def _read_events(self) -> set:
+        changed = set()
+        try:
+            buffer = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+
+        offset = 0
+        while offset < len(buffer):
+            wd, _mask, _cookie, length = EVENT_HEADER.unpack_from(buffer, offset)
+            offset += EVENT_HEADER.size
+            name = buffer[offset:offset + length].rstrip(b'\0')
+            offset += length
+
+            directory = self._wd_to_dir.get(wd)
+            if directory is None or not name:
+                continue
+            path = self._abs_to_path.get(os.path.join(directory, os.fsdecode(name)))
+            if path is not None:
+                changed.add(path)
+        return changed
+
+    def wait(self, timeout: float = None) -> set:
+        """Block until at least one watched file changes, or `timeout` seconds pass."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        changed = set()
+        while not changed:
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            readable, _, _ = select.select([self.fd], [], [], remaining)
+            if not readable:
+                return changed
+            changed |= self._read_events()
+
+        while select.select([self.fd], [], [], DEBOUNCE_SECONDS)[0]:
+            changed |= self._read_events()
+        return changed
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+
+def _load_libc():
+    libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+    libc.inotify_init1.argtypes = [ctypes.c_int]
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    return libc
+
+
+def create_watcher(paths, interval: float = 0.5):
+    """
+    Watch the given files with inotify where available, falling back to stat polling.
+
+    Args:
+        paths: Files to watch.
+        interval: Polling interval in seconds, used only by the fallback.
+    """
+    if sys.platform.startswith('linux'):
+        try:
+            return InotifyWatcher(paths)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(paths, interval)
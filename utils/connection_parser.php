@@ -2,7 +2,7 @@
 
 require_once __DIR__ . '/vendor/autoload.php';
 
-require __DIR__ . '/php_parser.php';
+require_once __DIR__ . '/php_parser.php';
 
 use PhpParser\ParserFactory;
 use PhpParser\Node;
@@ -12,10 +12,6 @@ use PhpParser\NodeVisitorAbstract;
 use PhpParser\Node\Stmt\Class_;
 
 
-$connections = [];
-
-$connectionsResultJson = './tmp/connections.json';
-
 class ConnectionVisitor extends NodeVisitorAbstract {
 
     private $currentClass, $currentMethod, $classes;
@@ -24,16 +20,20 @@ class ConnectionVisitor extends NodeVisitorAbstract {
 
     public function __construct($classes, $classToMethods, $classToAttributes)
     {
-        global $connections;
         $this->classes = &$classes;
         $this->classesToMethods = &$classToMethods;
         $this->classesToAttributes = &$classToAttributes;
         $this->currentClass = null;
         $this->currentMethod = null;
-        $this->allConnections = &$connections;
+        $this->allConnections = [];
         $this->temporaryConnections = [];
     }
 
+    public function getConnections(): array
+    {
+        return $this->allConnections;
+    }
+
     public function enterNode(Node $node)
     {
 
@@ -120,38 +120,44 @@ class ConnectionVisitor extends NodeVisitorAbstract {
     }
 }
 
-function parseConnection($file_name, $classes, $classToMethods, $classToAttributes)
+/**
+ * Parse the code once and run both visitors over the same AST.
+ *
+ * Returns the classes, classToMethods, classToAttributes and connections together,
+ * so callers that need the structure and the connections pay for a single parse.
+ */
+function extractModelFromCode($code): array
 {
-    $code = file_get_contents($file_name);
     $parserFactory = new ParserFactory();
     $parser = $parserFactory->create(ParserFactory::PREFER_PHP7);
+    $stmts = $parser->parse($code);
 
-    $connectionVisitor = new ConnectionVisitor($classes, $classToMethods, $classToAttributes);
+    $extractVisitor = new ExtractorVisitor();
     $nodeTraverser = new NodeTraverser();
-    $nodeTraverser->addVisitor($connectionVisitor);
-
-    $stmts = $parser->parse($code);
+    $nodeTraverser->addVisitor($extractVisitor);
     $nodeTraverser->traverse($stmts);
-}
-
-$file_name = $argv[1];
-$classesDataFileNameJson = $argv[2];
-$filenameToStoreConnectionsJson = $argv[3];
-
-echo "Parsing connections for file: $file_name\n";
-echo "Classes data file: $classesDataFileNameJson\n";
-echo "Storing connections to: $filenameToStoreConnectionsJson\n";
 
+    $connectionVisitor = new ConnectionVisitor($extractVisitor->classes, $extractVisitor->classToMethods, $extractVisitor->classToAttributes);
+    $nodeTraverser = new NodeTraverser();
+    $nodeTraverser->addVisitor($connectionVisitor);
+    $nodeTraverser->traverse($stmts);
 
-try {
-    $result = main($file_name, $classesDataFileNameJson);
-    $classes = $result[0];
-    $classToMethods = $result[1];
-    $classToAttributes = $result[2];
+    return [
+        "classes" => $extractVisitor->classes,
+        "classToMethods" => $extractVisitor->classToMethods,
+        "classToAttributes" => $extractVisitor->classToAttributes,
+        "connections" => $connectionVisitor->getConnections(),
+    ];
+}
 
-    parseConnection($file_name, $classes, $classToMethods, $classToAttributes);
-    $jsonString = json_encode($connections, JSON_PRETTY_PRINT);
-    file_put_contents($filenameToStoreConnectionsJson, $jsonString);
-} catch (PhpParser\Error $e) {
-    echo 'Parse Error: ', $e->getMessage();
-}
\ No newline at end of file
+// Usage: php connection_parser.php FILE [OUTPUT]. Emits the class structure and the
+// connections from a single parse. Without OUTPUT (or with '-') the result is written
+// to stdout, so concurrent runs never share a file.
+if (isset($argv) && realpath($argv[0]) === __FILE__) {
+    $filenameToStoreModelJson = isset($argv[2]) ? $argv[2] : null;
+    try {
+        writeJson(extractModelFromCode(file_get_contents($argv[1])), $filenameToStoreModelJson);
+    } catch (PhpParser\Error $e) {
+        writeJson(["error" => 'Parse Error: ' . $e->getMessage()], $filenameToStoreModelJson);
+    }
+}
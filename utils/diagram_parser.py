@@ -1,5 +1,6 @@
 import ast
 from diagramAudit.utils.logging_utils import log_error, log_warning
+from utils.inheritance import resolve_inherited_methods
 
 def extract_method_from_edge(node: ast.Call, variable_to_value: dict = {}) -> str:
     """
@@ -24,7 +25,7 @@ def extract_method_from_edge(node: ast.Call, variable_to_value: dict = {}) -> st
                 return kw.value.value
             elif isinstance(kw.value, ast.Name):
                 if kw.value.id in variable_to_value:
-                    return variable_to_value[kw.value.id][0]
+                    return next(iter(variable_to_value[kw.value.id]))
                 log_warning(f"Warning: Edge label is wrong: {ast.dump(kw.value)}")
             return None
     return None
@@ -33,50 +34,50 @@ class DiagramVisitor(ast.NodeVisitor):
     """AST Visitor that extracts classes, class-to-variable mappings, and connections from the diagram."""
     
     def __init__(self):
-        self.all_classes = []
+        # Classes, method lists and variable values are dicts used as insertion-ordered
+        # sets (values are always None), so de-duplicating additions is O(1).
+        self.all_classes = {}
         self.variable_to_class = {}
         self.all_connections = []
         self.all_class_to_methods = {}
         self.variable_to_value = {}
+        # child -> ordered set of parents; inherited methods are resolved once in get_results()
+        self.class_to_parents = {}
     
     def _add_class(self, class_name: str) -> None:
-        """Add a class to the internal list of classes."""
-        if class_name not in self.all_classes:
-            self.all_classes.append(class_name)
+        """Add a class to the internal set of classes."""
+        self.all_classes[class_name] = None
     
     def _map_variable_to_class(self, variable: str, class_name: str) -> None:
         self._add_class(class_name)
         self.variable_to_class[variable] = class_name
     
     def _map_variable_to_value(self, variable: str, value: str) -> None:
-        if variable not in self.variable_to_value:
-            self.variable_to_value[variable] = []
+        values = self.variable_to_value.setdefault(variable, {})
         # If it's a list, extend it; otherwise just append
         if isinstance(value, list):
             for v in value:
-                if v not in self.variable_to_value[variable]:
-                    self.variable_to_value[variable].append(v)
+                values[v] = None
         else:
-            if value not in self.variable_to_value[variable]:
-                self.variable_to_value[variable].append(value)
+            values[value] = None
 
     def _ensure_class_has_methods_list(self, class_name: str) -> None:
         """Ensure the given class name has an entry in all_class_to_methods."""
         if class_name not in self.all_class_to_methods:
-            self.all_class_to_methods[class_name] = []
+            self.all_class_to_methods[class_name] = {}
 
     def _add_to_connections(self, left_class_ids: list, method: str, right_class_ids: list, op: ast.operator) -> None:
         """Add connections between classes based on the operator and method."""
         for cls in right_class_ids:
             if cls not in self.all_class_to_methods and self.variable_to_class.get(cls) not in self.all_class_to_methods:
                 if cls in self.variable_to_class:
-                    self.all_class_to_methods[self.variable_to_class[cls]] = []
+                    self.all_class_to_methods[self.variable_to_class[cls]] = {}
                 else:
-                    self.all_class_to_methods[cls] = []
-            if cls in self.variable_to_value and type(self.variable_to_value[cls]) == list:
+                    self.all_class_to_methods[cls] = {}
+            if cls in self.variable_to_value:
                 for current_class in self.variable_to_value[cls]:
                     for _method in self.all_class_to_methods[cls]:
-                        self.all_class_to_methods[current_class] = [_method]
+                        self.all_class_to_methods[current_class] = {_method: None}
                         # self.add_class_to_methods(current_class, _method, cls)
                         # self.all_class_to_methods[current_class].append(_method)
 
@@ -120,30 +121,29 @@ class DiagramVisitor(ast.NodeVisitor):
                     self.add_class_to_methods(right_class, method, left_class)
 
 
+    def _record_inheritance(self, class_name, parent_class_name) -> None:
+        """
+        Record that `class_name` (or every class in that variable) inherits from
+        `parent_class_name`. Methods are copied later by resolve_inheritance(), so
+        the parent's methods may be declared before or after the edge.
+        """
+        if not parent_class_name:
+            return
+        if class_name in self.variable_to_value:
+            children = self.variable_to_value[class_name]
+        else:
+            children = [class_name]
+        for child in children:
+            self.class_to_parents.setdefault(child, {})[parent_class_name] = None
+
     def _map_class_to_methods(self, class_name, method: str, another_class_name) -> None:
         """
         Add a method to a class in the internal mapping or handle inheritance.
-        If `method == 'inherits'`, we copy inherited methods from another class.
+        If `method == 'inherits'`, the edge is recorded and resolved in get_results().
         """
         # Inheritance block
         if method == 'inherits':
-            if another_class_name and another_class_name in self.all_class_to_methods:
-                inherited_methods = self.all_class_to_methods[another_class_name]
-                # If class_name is actually a variable containing multiple classes
-                if class_name in self.variable_to_value:
-                    # We assume self.variable_to_value[class_name] is a list
-                    for current_class in self.variable_to_value[class_name]:
-                        self._ensure_class_has_methods_list(current_class)
-                        # Extend without duplicating
-                        for im in inherited_methods:
-                            if im not in self.all_class_to_methods[current_class]:
-                                self.all_class_to_methods[current_class].append(im)
-                else:
-                    # Single class_name
-                    self._ensure_class_has_methods_list(class_name)
-                    for im in inherited_methods:
-                        if im not in self.all_class_to_methods[class_name]:
-                            self.all_class_to_methods[class_name].append(im)
+            self._record_inheritance(class_name, another_class_name)
             return
 
         # Non-inheritance: Just add the method to class_name
@@ -151,13 +151,11 @@ class DiagramVisitor(ast.NodeVisitor):
         if class_name in self.variable_to_value:
             for current_class in self.variable_to_value[class_name]:
                 self._ensure_class_has_methods_list(current_class)
-                if method not in self.all_class_to_methods[current_class]:
-                    self.all_class_to_methods[current_class].append(method)
+                self.all_class_to_methods[current_class][method] = None
         else:
             # Single class
             self._ensure_class_has_methods_list(class_name)
-            if method not in self.all_class_to_methods[class_name]:
-                self.all_class_to_methods[class_name].append(method)
+            self.all_class_to_methods[class_name][method] = None
 
     def visit_Assign(self, node: ast.Assign) -> None:
         """Visit assignment nodes to track class variables and lists."""
@@ -280,7 +278,7 @@ class DiagramVisitor(ast.NodeVisitor):
             return [elt.id for elt in iter_node.elts if isinstance(elt, ast.Name)]
 
         if isinstance(iter_node, ast.Name) and iter_node.id in self.variable_to_value:
-            return self.variable_to_value[iter_node.id]
+            return list(self.variable_to_value[iter_node.id])
 
         return []
 
@@ -321,7 +319,7 @@ class DiagramVisitor(ast.NodeVisitor):
         elif right_id in self.variable_to_value:
             # Handle multiple values; return the first one (or handle as needed)
             values = self.variable_to_value[right_id]
-            return values[0] if isinstance(values, list) and values else None
+            return next(iter(values), None)
         else:
             log_warning(f"Warning: Right {right_id} not found in variable_to_class map.")
             return None
@@ -330,35 +328,31 @@ class DiagramVisitor(ast.NodeVisitor):
     def add_class_to_methods(self, class_name, method: str, another_class_name) -> None:
         """Add a method to a class in the internal mapping."""
         if method == 'inherits':
-            if another_class_name in self.all_class_to_methods:
-                inherited_methods = self.all_class_to_methods[another_class_name]
-                if class_name in self.variable_to_value:
-                    # For multiple classes in variable_to_value
-                    for current_class in self.variable_to_value[class_name]:
-                        self._ensure_class_has_methods_list(current_class)
-                        for inherited_method in inherited_methods:
-                            if inherited_method not in self.all_class_to_methods[current_class]:
-                                self.all_class_to_methods[current_class].append(inherited_method)
-                else:
-                    # Single class inheritance
-                    self._ensure_class_has_methods_list(class_name)
-                    for inherited_method in inherited_methods:
-                        if inherited_method not in self.all_class_to_methods[class_name]:
-                            self.all_class_to_methods[class_name].append(inherited_method)
+            self._record_inheritance(class_name, another_class_name)
             return
 
         # Non-inheritance case
         if class_name in self.variable_to_value:
             for current_class in self.variable_to_value[class_name]:
                 self._ensure_class_has_methods_list(current_class)
-                if method not in self.all_class_to_methods[current_class]:
-                    self.all_class_to_methods[current_class].append(method)
+                self.all_class_to_methods[current_class][method] = None
         else:
             self._ensure_class_has_methods_list(class_name)
-            if method not in self.all_class_to_methods[class_name]:
-                self.all_class_to_methods[class_name].append(method)
+            self.all_class_to_methods[class_name][method] = None
+
+
+    def resolve_inheritance(self) -> None:
+        """Copy parent methods, transitively, into every class with recorded inheritance edges."""
+        for child, parents in self.class_to_parents.items():
+            if any(parent in self.all_class_to_methods for parent in parents):
+                self._ensure_class_has_methods_list(child)
 
+        resolved = resolve_inherited_methods(self.all_class_to_methods, self.class_to_parents)
+        for class_name, methods in resolved.items():
+            self.all_class_to_methods[class_name] = dict.fromkeys(methods)
 
     def get_results(self) -> tuple:
-        """Get the analysis results."""
-        return self.all_classes, self.all_class_to_methods, self.all_connections, self.variable_to_class
\ No newline at end of file
+        """Get the analysis results after resolving inheritance."""
+        self.resolve_inheritance()
+        all_class_to_methods = {cls: list(methods) for cls, methods in self.all_class_to_methods.items()}
+        return list(self.all_classes), all_class_to_methods, self.all_connections, self.variable_to_class
\ No newline at end of file
@@ -0,0 +1,76 @@
+import subprocess
+
+
+class GitError(Exception):
+    """Raised when a git command fails."""
+
+
+def staged_files(diff_filter: str = 'ACM') -> list:
+    """
+    List the files staged for commit, relative to the repository root.
+
+    Args:
+        diff_filter: git diff --diff-filter value; by default added, copied and modified files.
+    """
+    completed = subprocess.run(
+        ['git', 'diff', '--cached', '--name-only', f'--diff-filter={diff_filter}', '-z'],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    if completed.returncode != 0:
+        raise GitError(completed.stderr.decode(errors='replace').strip() or "git diff --cached failed.")
+    return [name for name in completed.stdout.decode().split('\0') if name]
+
+
+class IndexReader:
+    """
+    Read staged blob contents through a single `git cat-file --batch` process.
+
+    Every file costs one request/response on the same pipe instead of one git
+    process per file. Use as a context manager, or call close() when done.
+    """
+
+    def __init__(self):
+        self.process = subprocess.Popen(
+            ['git', 'cat-file', '--batch'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+        )
+
+    def read(self, file_path: str):
+        """
+        Return the staged content of a file as bytes, or None if it is not in the index.
+
+        Args:
+            file_path: Path relative to the repository root.
+        """
+        if '\n' in file_path:
+            return None
+        self.process.stdin.write(f":{file_path}\n".encode())
+        self.process.stdin.flush()
+
+        header = self.process.stdout.readline()
+        if not header:
+            raise GitError("git cat-file --batch exited unexpectedly.")
+        fields = header.split()
+        if len(fields) != 3 or fields[-1] == b'missing':
+            return None
+
+        size = int(fields[2])
+        content = self.process.stdout.read(size)
+        self.process.stdout.read(1)  # trailing newline after each object
+        return content
+
+    def close(self) -> None:
+        if self.process is None:
+            return
+        self.process.stdin.close()
+        self.process.stdout.close()
+        self.process.wait()
+        self.process = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,51 @@
+from utils.logging_utils import log_warning
+
+
+def resolve_inherited_methods(class_to_methods: dict, class_to_parents: dict) -> dict:
+    """
+    Resolve the own and inherited methods of every class, transitively.
+
+    Classes are resolved parents-first (a depth-first topological order) and each
+    resolved method set is memoized, so the whole hierarchy is handled in
+    O(classes + edges) regardless of declaration order or depth. Parents that are
+    not in `class_to_methods` are ignored, and an edge that closes an inheritance
+    cycle is reported and skipped.
+
+    Args:
+        class_to_methods: { class: [own methods] }
+        class_to_parents: { class: [parent classes] }
+
+    Returns:
+        dict: { class: [own methods, then inherited methods in parent order] }
+    """
+    resolved = {}
+    in_progress = set()
+
+    for root in class_to_methods:
+        if root in resolved:
+            continue
+        in_progress.add(root)
+        stack = [(root, iter(class_to_parents.get(root, [])))]
+
+        while stack:
+            class_name, parents = stack[-1]
+            for parent in parents:
+                if parent not in class_to_methods or parent in resolved:
+                    continue
+                if parent in in_progress:
+                    log_warning(f"Warning: Inheritance cycle through {class_name} -> {parent} ignored.")
+                    continue
+                in_progress.add(parent)
+                stack.append((parent, iter(class_to_parents.get(parent, []))))
+                break
+            else:
+                # All parents are resolved: merge their memoized method sets.
+                stack.pop()
+                in_progress.discard(class_name)
+                methods = dict.fromkeys(class_to_methods[class_name])
+                for parent in class_to_parents.get(class_name, []):
+                    if parent in resolved:
+                        methods.update(resolved[parent])
+                resolved[class_name] = methods
+
+    return {class_name: list(methods) for class_name, methods in resolved.items()}
@@ -0,0 +1,204 @@
+import linecache
+import tracemalloc
+
+# Report at most this many rows per table.
+TOP_ROWS = 10
+# A new "largest footprint" snapshot is taken only when memory grew by this factor.
+SNAPSHOT_GROWTH = 1.1
+
+# Known structures, recognised by the allocating file and a name in the allocating
+# line or in the header of the function containing it.
+STRUCTURE_HINTS = (
+    ('ast.py', 'def parse', 'AST nodes'),
+    ('diagram_parser.py', 'variable_to_value', 'DiagramVisitor.variable_to_value'),
+    ('diagram_parser.py', 'all_connections', 'diagram connection lists'),
+    ('diagram_parser.py', 'class_to_methods', 'diagram method tables'),
+    ('connection_parser.py', 'connections', 'ConnectionParser connection lists'),
+    ('connection_parser.py', '_build_index', 'ConnectionParser lookup indexes'),
+    ('python_code_parser.py', 'class_to_methods', 'code method tables'),
+    ('python_code_parser.py', 'class_to_attributes', 'code attribute tables'),
+    ('inheritance.py', 'def resolve_inherited_methods', 'resolved inherited method lists'),
+    ('decoder.py', 'def ', 'decoded JSON (mapping, parse cache entries or PHP results)'),
+)
+
+_profiler = None
+
+
+class MemoryProfiler:
+    """
+    Measure peak and retained traced memory of nested stages with tracemalloc.
+
+    tracemalloc has a single global peak, so every stage entered resets it and
+    folds the peak seen so far into all enclosing stages; a stage's peak is
+    therefore exact even when stages nest. Stages without a file inherit the file
+    of the stage enclosing them.
+    """
+
+    def __init__(self):
+        self.frames = []
+        self.records = []
+        self.snapshot_rows = None
+        self.snapshot_label = None
+        self._snapshot_size = 0
+        self.overall_peak = 0
+        # Memory allocated by the profiler itself (snapshot summaries, linecache), left out of every figure.
+        self.overhead = 0
+
+    def traced_memory(self) -> tuple:
+        current, peak = tracemalloc.get_traced_memory()
+        return current - self.overhead, peak - self.overhead
+
+    def enter(self, stage: str, file_path: str = None) -> None:
+        current, peak = self.traced_memory()
+        self.overall_peak = max(self.overall_peak, peak)
+        for frame in self.frames:
+            frame['peak'] = max(frame['peak'], peak)
+        tracemalloc.reset_peak()
+        parent_file = self.frames[-1]['file'] if self.frames else None
+        self.frames.append({
+            'stage': stage,
+            'file': file_path or parent_file,
+            'file_root': bool(file_path) and file_path != parent_file,
+            'start': current,
+            'peak': current,
+        })
+
+    def exit(self) -> None:
+        current, peak = self.traced_memory()
+        self.overall_peak = max(self.overall_peak, peak)
+        frame = self.frames.pop()
+        frame['peak'] = max(frame['peak'], peak)
+        if self.frames:
+            self.frames[-1]['peak'] = max(self.frames[-1]['peak'], frame['peak'])
+
+        self.records.append((
+            frame['stage'],
+            frame['file'],
+            frame['file_root'],
+            frame['peak'] - frame['start'],
+            current - frame['start'],
+        ))
+
+        # Summarize the allocations at the largest footprint seen so far, while the
+        # stage's structures (e.g. a file's AST) are still alive. Only the summary
+        # is kept, and the snapshot's own allocations are left out of every peak.
+        if current > self._snapshot_size * SNAPSHOT_GROWTH:
+            self._snapshot_size = current
+            before = tracemalloc.get_traced_memory()[0]
+            self.snapshot_rows = _dominant_allocations(tracemalloc.take_snapshot())
+            self.snapshot_label = f"{frame['stage']} ({frame['file']})" if frame['file'] else frame['stage']
+            self.overhead += tracemalloc.get_traced_memory()[0] - before
+            tracemalloc.reset_peak()
+
+    def stage_rows(self) -> list:
+        """(stage, calls, max peak, total retained) sorted by max peak."""
+        stages = {}
+        for stage, _, _, peak, retained in self.records:
+            calls, max_peak, total_retained = stages.get(stage, (0, 0, 0))
+            stages[stage] = (calls + 1, max(max_peak, peak), total_retained + retained)
+        return sorted(((stage, *values) for stage, values in stages.items()), key=lambda row: -row[2])
+
+    def file_rows(self) -> list:
+        """(file, peak, retained) sorted by peak; retained counts only the file's outermost stages."""
+        files = {}
+        for _, file_path, file_root, peak, retained in self.records:
+            if file_path is None:
+                continue
+            max_peak, total_retained = files.get(file_path, (0, 0))
+            files[file_path] = (max(max_peak, peak), total_retained + (retained if file_root else 0))
+        return sorted(((file_path, *values) for file_path, values in files.items()), key=lambda row: -row[1])
+
+
+def format_size(size: int) -> str:
+    for unit in ('B', 'KiB', 'MiB'):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+def _structure_at(filename: str, lineno: int):
+    """Name the known structure allocated at a source line, if any."""
+    text = linecache.getline(filename, lineno)
+    for line_number in range(lineno - 1, 0, -1):
+        line = linecache.getline(filename, line_number).strip()
+        if line.startswith('def '):
+            text = line + '\n' + text
+            break
+    for file_name, marker, structure in STRUCTURE_HINTS:
+        if filename.endswith(file_name) and marker in text:
+            return structure
+    return None
+
+
+def _dominant_allocations(snapshot) -> list:
+    """(size, share, 'file:line  source', structure) of the allocation sites holding the most memory."""
+    snapshot = snapshot.filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, linecache.__file__),
+        tracemalloc.Filter(False, __file__),
+    ))
+    statistics = snapshot.statistics('lineno')
+    total = sum(stat.size for stat in statistics) or 1
+    rows = []
+    for stat in statistics[:TOP_ROWS]:
+        frame = stat.traceback[0]
+        source = linecache.getline(frame.filename, frame.lineno).strip()
+        rows.append((stat.size, stat.size / total, f"{frame.filename}:{frame.lineno}  {source}", _structure_at(frame.filename, frame.lineno)))
+    return rows
+
+
+def enable_memory_report() -> None:
+    """Start tracing allocations; stages are measured from now on."""
+    global _profiler
+    if _profiler is None:
+        tracemalloc.start()
+        _profiler = MemoryProfiler()
+
+
+def memory_profiling_enabled() -> bool:
+    return _profiler is not None
+
+
+def enter_stage(stage: str, file_path: str = None) -> None:
+    _profiler.enter(stage, file_path)
+
+
+def exit_stage() -> None:
+    _profiler.exit()
+
+
+def print_memory_report() -> None:
+    """Print peak and retained memory per stage and per file, and the dominant allocation sites."""
+    if _profiler is None:
+        return
+    current, peak = _profiler.traced_memory()
+    overall_peak = max(_profiler.overall_peak, peak)
+
+    print("\n===== Memory Report =====")
+    print(f"Peak traced memory: {format_size(overall_peak)}, traced memory now: {format_size(current)}")
+    print("Peak and retained sizes are measured from the start of each stage.\n")
+
+    print(f"{'stage':<28} {'calls':>7} {'max peak':>12} {'retained':>12}")
+    for stage, calls, max_peak, retained in _profiler.stage_rows():
+        print(f"{stage:<28} {calls:>7} {format_size(max_peak):>12} {format_size(retained):>12}")
+
+    file_rows = _profiler.file_rows()
+    if file_rows:
+        print(f"\n{'file (largest peaks)':<60} {'peak':>12} {'retained':>12}")
+        for file_path, file_peak, retained in file_rows[:TOP_ROWS]:
+            print(f"{file_path:<60} {format_size(file_peak):>12} {format_size(retained):>12}")
+
+    if _profiler.snapshot_rows is not None:
+        print(f"\nDominant allocations at the largest footprint, after {_profiler.snapshot_label}:")
+        _print_allocations(_profiler.snapshot_rows)
+
+    print("\nDominant allocations still alive now:")
+    _print_allocations(_dominant_allocations(tracemalloc.take_snapshot()))
+
+
+def _print_allocations(rows: list) -> None:
+    for size, share, site, structure in rows:
+        print(f"{format_size(size):>12} {share:>6.1%}  {site}")
+        if structure:
+            print(f"{'':>21}-> {structure}")
@@ -0,0 +1,203 @@
+import hashlib
+import json
+import os
+import tempfile
+import zlib
+from utils.tracing import span
+
+TOOL_VERSION = '0.1.0'
+CACHE_FORMAT = 3
+
+DEFAULT_MAX_BYTES = 64 * 1024 * 1024
+ENTRY_SUFFIX = '.json.z'
+
+# Subdirectory of the render cache's stamps (see utils/render_cache.py), which share
+# the cache's size cap and are cleared with it.
+RENDER_DIR = 'render'
+STAMP_SUFFIX = '.json'
+
+# Every parser kind that stores results in the cache.
+KINDS = (
+    'python', 'python_model', 'python_summary', 'php', 'php_model',
+    'diagram', 'diagram_dot', 'diagram_mermaid', 'diagram_plantuml',
+)
+
+
+def default_cache_dir() -> str:
+    """Cache location: $DIAGRAM_AUDIT_CACHE_DIR, else $XDG_CACHE_HOME/diagram_audit, else ~/.cache/diagram_audit."""
+    if os.environ.get('DIAGRAM_AUDIT_CACHE_DIR'):
+        return os.environ['DIAGRAM_AUDIT_CACHE_DIR']
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'diagram_audit')
+
+
+class ParseCache:
+    """
+    Content-addressed on-disk cache of parser results.
+
+    Entries are keyed by the parser kind, the tool version and the SHA-256 of the
+    file content, and stored as zlib-compressed compact JSON. Reads refresh an
+    entry's mtime, so eviction by oldest mtime is least-recently-used. Render
+    stamps in the same directory count towards `max_bytes` and are evicted alike.
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.cache_dir = cache_dir or default_cache_dir()
+        self.max_bytes = max_bytes
+        self._written_since_check = None
+
+    def key(self, kind: str, content: bytes) -> str:
+        """Build the cache key for a parser kind and raw file content."""
+        digest = hashlib.sha256()
+        digest.update(f"{kind}\0{TOOL_VERSION}\0{CACHE_FORMAT}\0".encode())
+        digest.update(content)
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + ENTRY_SUFFIX)
+
+    def get(self, kind: str, content: bytes):
+        """Return the cached result tuple, or None on a miss."""
+        path = self._entry_path(self.key(kind, content))
+        try:
+            with open(path, 'rb') as f:
+                payload = f.read()
+            result = json.loads(zlib.decompress(payload))
+        except (OSError, ValueError, zlib.error):
+            return None
+
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return tuple(result)
+
+    def put(self, kind: str, content: bytes, result: tuple) -> None:
+        """Store a result tuple for the given content."""
+        path = self._entry_path(self.key(kind, content))
+        payload = zlib.compress(json.dumps(result, separators=(',', ':')).encode())
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Write then rename so concurrent audits never read a partial entry.
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        self.note_write(len(payload))
+
+    def note_write(self, size: int) -> None:
+        """Account for `size` bytes written to the cache directory, evicting once enough have accumulated."""
+        if self._written_since_check is None or self._written_since_check + size > self.max_bytes // 10:
+            self.evict()
+        else:
+            self._written_since_check += size
+
+    def _entries(self) -> list:
+        """List (mtime, size, path) for every entry and render stamp in the cache directory."""
+        entries = []
+        try:
+            shards = list(os.scandir(self.cache_dir))
+        except OSError:
+            return entries
+        for shard in shards:
+            if not shard.is_dir():
+                continue
+            suffix = STAMP_SUFFIX if shard.name == RENDER_DIR else ENTRY_SUFFIX
+            for entry in os.scandir(shard.path):
+                if not entry.name.endswith(suffix):
+                    continue
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        return entries
+
+    def evict(self) -> None:
+        """Remove least-recently-used entries until the cache fits in `max_bytes`."""
+        self._written_since_check = 0
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total <= self.max_bytes:
+            return
+
+        # Trim a little below the cap so the next few writes don't trigger another scan.
+        target = self.max_bytes * 9 // 10
+        for _, size, path in sorted(entries):
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def invalidate(self, file_path: str, kinds: tuple = KINDS) -> None:
+        """Drop the entries for the current content of a file."""
+        try:
+            with open(file_path, 'rb') as f:
+                content = f.read()
+        except OSError:
+            return
+        for kind in kinds:
+            try:
+                os.remove(self._entry_path(self.key(kind, content)))
+            except OSError:
+                pass
+
+    def clear(self) -> None:
+        """Remove every entry and render stamp from the cache."""
+        for _, _, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+_cache = None
+_cache_enabled = True
+
+
+def configure_cache(enabled: bool = True, cache_dir: str = None, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+    """Enable, disable or relocate the process-wide parse cache."""
+    global _cache, _cache_enabled
+    _cache_enabled = enabled
+    _cache = ParseCache(cache_dir, max_bytes) if enabled else None
+
+
+def get_cache():
+    """Return the process-wide ParseCache, or None when caching is disabled."""
+    global _cache
+    if not _cache_enabled:
+        return None
+    if _cache is None:
+        _cache = ParseCache()
+    return _cache
+
+
+def cached_parse(kind: str, content: bytes, parse):
+    """
+    Return `parse()` for the given content, served from the cache when possible.
+
+    Args:
+        kind: Parser kind, e.g. 'python', 'php' or 'diagram'.
+        content: Raw file content the result depends on.
+        parse: Zero-argument callable producing the result tuple on a miss.
+    """
+    cache = get_cache()
+    if cache is None:
+        return parse()
+
+    with span('cache get', 'cache', kind=kind) as span_args:
+        result = cache.get(kind, content)
+        span_args['hit'] = result is not None
+    if result is not None:
+        return result
+
+    result = parse()
+    with span('cache put', 'cache', kind=kind):
+        cache.put(kind, content, result)
+    return result
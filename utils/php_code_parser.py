@@ -1,11 +1,155 @@
+import atexit
 import os
 import subprocess, json
+from contextlib import contextmanager
+from utils.tracing import span
 
-php_parser = 'utils/php_parser.php'
-php_connection_parser = 'utils/connection_parser.php'
+utils_dir = os.path.dirname(os.path.abspath(__file__))
+
+php_parser = os.path.join(utils_dir, 'php_parser.php')
+php_connection_parser = os.path.join(utils_dir, 'connection_parser.php')
+
+
+class PhpParserError(Exception):
+    """Raised when the PHP parser reports an error or its worker cannot be reached."""
+
+
+class PhpParserWorker:
+    """
+    A long-lived `php php_parser.php --worker` process.
+
+    Requests and responses are exchanged as JSON lines over stdin/stdout, so PHP
+    startup and the php-parser autoloader are paid once per worker instead of
+    once per file. A worker that dies is restarted on the next request.
+    """
+
+    def __init__(self):
+        self.process = None
+        self._next_id = 0
+
+    def start(self) -> None:
+        """Start the PHP process, replacing a dead one."""
+        self.close()
+        # Notices go to stderr so they can't corrupt the JSON lines on stdout.
+        with span('php worker start', 'subprocess'):
+            self.process = subprocess.Popen(
+                ['php', '-d', 'display_errors=stderr', php_parser, '--worker'],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                text=True,
+                bufsize=1,
+            )
+
+    def request(self, payload: dict) -> dict:
+        """
+        Send one request and wait for its response.
+
+        Args:
+            payload: {'path': ...} or {'source': ...}
+
+        Returns:
+            dict: The decoded response line.
+        """
+        for _ in range(2):
+            if self.process is None or self.process.poll() is not None:
+                self.start()
+
+            self._next_id += 1
+            request_id = self._next_id
+            try:
+                self.process.stdin.write(json.dumps(dict(payload, id=request_id)) + '\n')
+                self.process.stdin.flush()
+                response = self._read_response(request_id)
+            except (BrokenPipeError, OSError):
+                response = None
+            except ValueError as e:
+                # Every request gets exactly one line, so waiting for another would block forever.
+                raise PhpParserError(f"PHP parser worker sent an unreadable response for {payload.get('path', '<source>')}.") from e
+
+            if response is not None:
+                return response
+            # The worker crashed mid-request; restart it and retry once.
+            self.close()
+
+        raise PhpParserError(f"PHP parser worker failed while handling {payload.get('path', '<source>')}.")
+
+    def _read_response(self, request_id: int):
+        """The response to `request_id`, or None if the worker died; raises ValueError for an undecodable line."""
+        while True:
+            line = self.process.stdout.readline()
+            if not line:
+                return None
+            response = json.loads(line)
+            if isinstance(response, dict) and response.get('id') == request_id:
+                return response
+
+    def close(self) -> None:
+        """Stop the PHP process. Closing stdin lets the worker loop exit cleanly."""
+        if self.process is None:
+            return
+        try:
+            self.process.stdin.close()
+            self.process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            self.process.kill()
+            self.process.wait()
+        finally:
+            self.process.stdout.close()
+            self.process = None
+
+
+_worker = None
+
+
+def start_php_worker() -> PhpParserWorker:
+    """
+    Route PHP parsing in this process through a persistent worker until it exits.
+
+    The worker also stops on its own when this process dies, because its stdin closes.
+    """
+    global _worker
+    if _worker is None:
+        _worker = PhpParserWorker()
+        atexit.register(_worker.close)
+    return _worker
+
+
+@contextmanager
+def php_worker_session():
+    """Keep a PHP parser worker alive for the duration of a batch."""
+    global _worker
+    previous = _worker
+    _worker = PhpParserWorker()
+    try:
+        yield _worker
+    finally:
+        _worker.close()
+        _worker = previous
+
+
+def _worker_request(payload: dict) -> dict:
+    with span('php worker request', 'subprocess', file=payload.get('path', '<source>')):
+        return _worker.request(payload)
+
+
+def _response_to_tuple(response: dict) -> tuple:
+    if response.get('error'):
+        raise PhpParserError(response['error'])
+    return response['classes'], response['classToMethods'], response['classToAttributes']
+
+
+def extract_php_source_data(source: str):
+    """
+    Parse PHP source text through a worker.
+
+    Returns:
+        tuple: (classes, methods, attributes)
+    """
+    if _worker is not None:
+        return _response_to_tuple(_worker_request({'source': source}))
+    with php_worker_session():
+        return _response_to_tuple(_worker_request({'source': source}))
 
-php_data_file = 'utils/tmp/data.json'
-php_connections_file = 'utils/tmp/connections.json'
 
 def extract_php_data(file_path):
     """
@@ -17,23 +161,39 @@ def extract_php_data(file_path):
     Returns:
         tuple: (classes, methods, attributes)
     """
-    global php_parser, php_data_file
-    subprocess.run(['php', php_parser, file_path, php_data_file])
+    if _worker is not None:
+        return _response_to_tuple(_worker_request({'path': file_path}))
 
-    with open(php_data_file, 'r') as f:
-        content = f.read()
-    parsed_json_list = json.loads(content)
-    return parsed_json_list['classes'], parsed_json_list['classToMethods'], parsed_json_list['classToAttributes']
+    return _response_to_tuple(_run_php_script(php_parser, file_path))
 
-def extract_connections(file_path):
-    global php_connection_parser, php_connections_file, php_data_file
 
-    _php_data_file = php_data_file.split('/')[-1].split('.')[0] + '_temp.json'
+def extract_php_model(file_path):
+    """
+    Parse a PHP code file once and extract its structure and connections together.
 
-    subprocess.run(['php', php_connection_parser, file_path, _php_data_file, php_connections_file])
+    Args:
+        file_path: File path to the PHP code file.
+
+    Returns:
+        tuple: (classes, methods, attributes, connections)
+    """
+    if _worker is not None:
+        response = _worker_request({'path': file_path, 'connections': True})
+    else:
+        response = _run_php_script(php_connection_parser, file_path)
+    return _response_to_tuple(response) + (response['connections'],)
 
-    os.remove(_php_data_file)
-    with open(php_connections_file, 'r') as f:
-        content = f.read()
 
-    return json.loads(content)
\ No newline at end of file
+def _run_php_script(script: str, *args: str):
+    """Run a PHP script and decode the JSON it writes to stdout."""
+    file_path = args[-1]
+    with span('php subprocess', 'subprocess', script=os.path.basename(script), file=file_path):
+        completed = subprocess.run(
+            ['php', '-d', 'display_errors=stderr', script, *args],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+    try:
+        return json.loads(completed.stdout)
+    except ValueError as e:
+        raise PhpParserError(f"PHP parser produced no result for {file_path} (exit code {completed.returncode}).") from e
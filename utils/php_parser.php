@@ -10,21 +10,14 @@ use PhpParser\NodeTraverser;
 use PhpParser\NodeVisitorAbstract;
 use PhpParser\Node\Stmt\Class_;
 
-$file_name = './classes_without_diagrams/project_classes.php';
-$json_output = './tmp/output.json';
-
-$classes = [];
-$classToMethods = [];
-$classToAttributes = [];
-
 class ExtractorVisitor extends NodeVisitorAbstract {
-    private $classes, $classToMethods, $classToAttributes, $currentClass;
+    public $classes, $classToMethods, $classToAttributes;
+    private $currentClass;
     public function __construct()
     {
-        global $classes, $classToMethods, $classToAttributes;
-        $this->classes = &$classes;
-        $this->classToMethods = &$classToMethods;
-        $this->classToAttributes = &$classToAttributes;
+        $this->classes = [];
+        $this->classToMethods = [];
+        $this->classToAttributes = [];
         $this->currentClass = null;
     }
     public function enterNode(Node $node) {
@@ -61,10 +54,13 @@ class ExtractorVisitor extends NodeVisitorAbstract {
     }
 }
 
-function extractData($filename){
-    $code = file_get_contents($filename);
-    $parserFactory = new ParserFactory();
-    $parser = $parserFactory->create(ParserFactory::PREFER_PHP7);
+function extractDataFromCode($code): array
+{
+    static $parser = null;
+    if ($parser === null) {
+        $parserFactory = new ParserFactory();
+        $parser = $parserFactory->create(ParserFactory::PREFER_PHP7);
+    }
     $stmts = $parser->parse($code);
 
     $nodeTraverser = new NodeTraverser();
@@ -72,29 +68,102 @@ function extractData($filename){
     $nodeTraverser->addVisitor($extractVisitor);
 
     $nodeTraverser->traverse($stmts);
+    return [$extractVisitor->classes, $extractVisitor->classToMethods, $extractVisitor->classToAttributes];
 }
 
-function parseDataToJson($filename, $json_output): ?array
+function extractData($filename): array
 {
-    try {
-        global $classes, $classToMethods, $classToAttributes;
+    return extractDataFromCode(file_get_contents($filename));
+}
 
-        extractData($filename);
-        $resultJson = json_encode(["classes" => $classes, "classToMethods" => $classToMethods, "classToAttributes" => $classToAttributes], JSON_PRETTY_PRINT);
+/**
+ * Write a JSON document to $json_output, or to stdout when it is null or '-'.
+ */
+function writeJson($data, $json_output = null)
+{
+    $resultJson = json_encode($data, JSON_PRETTY_PRINT | JSON_INVALID_UTF8_SUBSTITUTE);
+    if ($json_output === null || $json_output === '-') {
+        fwrite(STDOUT, $resultJson . "\n");
+    } else {
         file_put_contents($json_output, $resultJson);
+    }
+}
+
+function parseDataToJson($filename, $json_output = null): ?array
+{
+    try {
+        list($classes, $classToMethods, $classToAttributes) = extractData($filename);
+        writeJson(["classes" => $classes, "classToMethods" => $classToMethods, "classToAttributes" => $classToAttributes], $json_output);
         return [$classes, $classToMethods, $classToAttributes];
     } catch (PhpParser\Error $e) {
-        echo 'Parse Error: ', $e->getMessage();
+        writeJson(["error" => 'Parse Error: ' . $e->getMessage()], $json_output);
         return null;
     }
 }
 
-function main($filename, $json_output): ?array
+function main($filename, $json_output = null): ?array
 {
-    extractData($filename);
     return parseDataToJson($filename, $json_output);
 }
 
-$file_name = $argv[1];
-$json_output = $argv[2];
-main($file_name, $json_output);
\ No newline at end of file
+/**
+ * Serve parse requests until stdin closes.
+ *
+ * Each input line is a JSON object with either a "path" or a "source" key (plus an
+ * optional "id" that is echoed back, and "connections": true to also run the
+ * connection visitor). Each output line is a JSON object with
+ * classes/classToMethods/classToAttributes (and connections), or an "error" message.
+ */
+function runWorker()
+{
+    while (($line = fgets(STDIN)) !== false) {
+        $line = trim($line);
+        if ($line === '') continue;
+
+        $request = json_decode($line, true);
+        $response = ["id" => isset($request["id"]) ? $request["id"] : null];
+        try {
+            if (!is_array($request)) {
+                throw new RuntimeException("Malformed request: $line");
+            }
+            if (isset($request["source"])) {
+                $code = $request["source"];
+            } else {
+                $code = @file_get_contents($request["path"]);
+                if ($code === false) {
+                    throw new RuntimeException("Cannot read file: " . $request["path"]);
+                }
+            }
+            if (!empty($request["connections"])) {
+                require_once __DIR__ . '/connection_parser.php';
+                $response = array_merge($response, extractModelFromCode($code));
+            } else {
+                list($classes, $classToMethods, $classToAttributes) = extractDataFromCode($code);
+                $response["classes"] = $classes;
+                $response["classToMethods"] = $classToMethods;
+                $response["classToAttributes"] = $classToAttributes;
+            }
+        } catch (PhpParser\Error $e) {
+            $response["error"] = 'Parse Error: ' . $e->getMessage();
+        } catch (Exception $e) {
+            $response["error"] = $e->getMessage();
+        }
+        // Invalid UTF-8, e.g. a Latin-1 token quoted in a parse error, becomes U+FFFD
+        // instead of making json_encode fail and leave the client waiting for a response.
+        $responseJson = json_encode($response, JSON_INVALID_UTF8_SUBSTITUTE);
+        if ($responseJson === false) {
+            $responseJson = json_encode(["id" => $response["id"], "error" => "Cannot encode response: " . json_last_error_msg()]);
+        }
+        fwrite(STDOUT, $responseJson . "\n");
+        fflush(STDOUT);
+    }
+}
+
+// Only run when executed directly, not when required by connection_parser.php.
+if (isset($argv) && realpath($argv[0]) === __FILE__) {
+    if ($argv[1] === '--worker') {
+        runWorker();
+    } else {
+        main($argv[1], isset($argv[2]) ? $argv[2] : null);
+    }
+}
\ No newline at end of file
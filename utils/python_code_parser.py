@@ -1,4 +1,5 @@
 import ast
+from utils.inheritance import resolve_inherited_methods
 
 class PythonCodeVisitor(ast.NodeVisitor):
     """AST Visitor to parse code classes and methods, including inheritance resolution."""
@@ -47,19 +48,8 @@ class PythonCodeVisitor(ast.NodeVisitor):
         self.generic_visit(node)
 
     def resolve_inheritance(self) -> None:
-        """Resolve inherited methods for all classes."""
-        resolved_methods = {}
-        for class_name in self.classes:
-            resolved_methods[class_name] = set(self.class_to_methods.get(class_name, []))
-
-        for class_name, parents in self.class_to_parents.items():
-            for parent in parents:
-                if parent not in resolved_methods:
-                    continue
-                resolved_methods[class_name].update(resolved_methods[parent])
-
-        for class_name in resolved_methods:
-            self.class_to_methods[class_name] = list(resolved_methods[class_name])
+        """Resolve inherited methods, including grandparents', for all classes."""
+        self.class_to_methods.update(resolve_inherited_methods(self.class_to_methods, self.class_to_parents))
 
     def get_results(self) -> tuple:
         """Get the analysis results after resolving inheritance."""
@@ -0,0 +1,153 @@
+import json
+from utils.parse_cache import TOOL_VERSION
+
+MACHINE_FORMATS = ('json', 'ndjson', 'sarif')
+
+SARIF_SCHEMA = 'https://json.schemastore.org/sarif-2.1.0.json'
+
+# SARIF rule id and description for every kind of discrepancy.
+SARIF_RULES = (
+    ('missing-class', 'A class in the diagram is missing from the code.'),
+    ('extra-class', 'A class in the code is missing from the diagram.'),
+    ('missing-method', 'A method in the diagram is missing from the code.'),
+    ('extra-method', 'A method in the code is missing from the diagram.'),
+    ('parse-error', 'A code or diagram file could not be read or parsed.'),
+)
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, sort_keys=True, ensure_ascii=False)
+
+
+def result_status(result: dict) -> str:
+    """'error', 'discrepancies' or 'ok' for an audit result."""
+    if result['error']:
+        return 'error'
+    if result['missing_classes'] or result['extra_classes'] or result['missing_methods'] or result['extra_methods']:
+        return 'discrepancies'
+    return 'ok'
+
+
+def result_record(result: dict) -> dict:
+    """An audit result as JSON-serializable data, with every set turned into a sorted list."""
+    return {
+        'code_files': list(result['code_files']),
+        'diagram_files': list(result['diagram_files']),
+        'status': result_status(result),
+        'error': result['error'],
+        'missing_classes': sorted(result['missing_classes']),
+        'extra_classes': sorted(result['extra_classes']),
+        'missing_methods': {cls: sorted(methods) for cls, methods in result['missing_methods'].items()},
+        'extra_methods': {cls: sorted(methods) for cls, methods in result['extra_methods'].items()},
+    }
+
+
+class NdjsonReporter:
+    """Write one JSON object per audit result and line, flushed as soon as the result is known."""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def report(self, result: dict) -> None:
+        self.stream.write(_dumps(result_record(result)) + "\n")
+        self.stream.flush()
+
+    def close(self) -> None:
+        pass
+
+
+class JsonReporter:
+    """
+    Write the audit results as one JSON array.
+
+    The array is streamed: its elements are written as the results arrive and the
+    closing bracket by close(), so no result is kept in memory.
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+
+    def report(self, result: dict) -> None:
+        self.stream.write(("[\n" if not self.count else ",\n") + _dumps(result_record(result)))
+        self.stream.flush()
+        self.count += 1
+
+    def close(self) -> None:
+        self.stream.write("\n]\n" if self.count else "[]\n")
+        self.stream.flush()
+
+
+def _sarif_locations(file_paths: list) -> list:
+    return [{'physicalLocation': {'artifactLocation': {'uri': file_path}}} for file_path in file_paths]
+
+
+def sarif_results(result: dict) -> list:
+    """The SARIF results of one audit result: one per discrepancy, located in the group's code files (all its files for a parse error)."""
+    code_files = list(result['code_files'])
+    diagram_files = list(result['diagram_files'])
+    names = ', '.join(code_files)
+    diagrams = ', '.join(diagram_files)
+    messages = []
+
+    if result['error']:
+        messages.append(('parse-error', result['error'], code_files + diagram_files))
+    for cls in sorted(result['missing_classes']):
+        messages.append(('missing-class', f"Class {cls} is in {diagrams} but not in {names}.", code_files))
+    for cls in sorted(result['extra_classes']):
+        messages.append(('extra-class', f"Class {cls} is in {names} but not in {diagrams}.", code_files))
+    for cls, methods in sorted(result['missing_methods'].items()):
+        for method in sorted(methods):
+            messages.append(('missing-method', f"Method {cls}.{method} is in {diagrams} but not in {names}.", code_files))
+    for cls, methods in sorted(result['extra_methods'].items()):
+        for method in sorted(methods):
+            messages.append(('extra-method', f"Method {cls}.{method} is in {names} but not in {diagrams}.", code_files))
+
+    return [
+        {
+            'level': 'error',
+            'locations': _sarif_locations(file_paths),
+            'message': {'text': text},
+            'properties': {'diagramFiles': diagram_files},
+            'ruleId': rule_id,
+        }
+        for rule_id, text, file_paths in messages
+    ]
+
+
+class SarifReporter:
+    """
+    Write a SARIF 2.1.0 log with a single run, for code scanning tools.
+
+    Like JsonReporter, the run's results array is streamed; the keys of the log
+    are sorted, so the tool description follows the results and is written by close().
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.count = 0
+        self.stream.write(f'{{"$schema": {_dumps(SARIF_SCHEMA)}, "runs": [{{"results": [')
+        self.stream.flush()
+
+    def report(self, result: dict) -> None:
+        for sarif_result in sarif_results(result):
+            self.stream.write(("\n" if not self.count else ",\n") + _dumps(sarif_result))
+            self.count += 1
+        self.stream.flush()
+
+    def close(self) -> None:
+        tool = {
+            'driver': {
+                'name': 'diagram-audit',
+                'rules': [{'id': rule_id, 'shortDescription': {'text': text}} for rule_id, text in SARIF_RULES],
+                'version': TOOL_VERSION,
+            },
+        }
+        separator = "\n" if self.count else ""
+        self.stream.write(f'{separator}], "tool": {_dumps(tool)}}}], "version": "2.1.0"}}\n')
+        self.stream.flush()
+
+
+def create_machine_reporter(output_format: str, stream):
+    """The reporter for one of MACHINE_FORMATS, writing to `stream`."""
+    return {'json': JsonReporter, 'ndjson': NdjsonReporter, 'sarif': SarifReporter}[output_format](stream)
@@ -0,0 +1,102 @@
+import contextlib
+import json
+import os
+import threading
+import time
+from utils.memory_profile import enter_stage, exit_stage, memory_profiling_enabled
+
+# Recorded trace events, or None while tracing is off so spans cost almost nothing.
+_events = None
+
+
+def enable_tracing() -> None:
+    """Start recording spans in this process."""
+    global _events
+    if _events is None:
+        _events = []
+
+
+def tracing_enabled() -> bool:
+    return _events is not None
+
+
+def _now_us() -> float:
+    # CLOCK_MONOTONIC is shared by every process on the machine, so events from
+    # worker processes line up with the parent's on one timeline.
+    return time.monotonic_ns() / 1000
+
+
+@contextlib.contextmanager
+def span(name: str, category: str = 'stage', **args):
+    """
+    Record the duration of the enclosed block as a Chrome trace "complete" event.
+
+    Keyword arguments become the event's args (e.g. file=...). The yielded dict can
+    be updated inside the block to attach results such as a cache hit. With
+    --memory-report, the same block is measured as a memory stage.
+    """
+    profiling = memory_profiling_enabled()
+    if _events is None and not profiling:
+        yield {}
+        return
+
+    if profiling:
+        enter_stage(name, args.get('file'))
+    start = _now_us()
+    try:
+        yield args
+    finally:
+        if profiling:
+            exit_stage()
+        if _events is not None:
+            _events.append({
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': round(start, 3),
+                'dur': round(_now_us() - start, 3),
+                'pid': os.getpid(),
+                'tid': threading.get_native_id(),
+                'args': args,
+            })
+
+
+def collect_events() -> list:
+    """Return and forget the events recorded so far in this process."""
+    global _events
+    events, _events = _events or [], ([] if _events is not None else None)
+    return events
+
+
+def add_events(events: list) -> None:
+    """Merge events recorded in another process, e.g. returned by run_traced."""
+    if _events is not None:
+        _events.extend(events)
+
+
+def run_traced(function, *args):
+    """
+    Call `function(*args)` with tracing on and return (result, events).
+
+    Meant for process pool workers: the events travel back with the result and
+    the parent merges them with add_events.
+    """
+    enable_tracing()
+    result = function(*args)
+    return result, collect_events()
+
+
+def write_trace(trace_file: str, process_name: str) -> None:
+    """Write every recorded event to `trace_file` in Chrome trace-event JSON format."""
+    events = list(_events or [])
+    main_pid = os.getpid()
+    for pid in sorted({event['pid'] for event in events} | {main_pid}):
+        events.append({
+            'name': 'process_name',
+            'ph': 'M',
+            'pid': pid,
+            'args': {'name': process_name if pid == main_pid else f"{process_name} worker {pid}"},
+        })
+
+    with open(trace_file, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, separators=(',', ':'))
@@ -0,0 +1,45 @@
+import functools
+from concurrent.futures import ProcessPoolExecutor
+from utils.parse_cache import configure_cache, get_cache
+from utils.tracing import add_events, collect_events, run_traced, tracing_enabled
+
+
+def _init_worker(cache_args: tuple, start=None) -> None:
+    configure_cache(*cache_args)
+    if start is not None:
+        start()
+    # Forked workers start with a copy of the parent's spans; only report their own.
+    collect_events()
+
+
+def map_in_workers(function, items: list, jobs: int, start=None):
+    """
+    Yield function(*item) for every item, in order, across `jobs` worker processes.
+
+    With one job, or a single item, everything runs in this process. Workers inherit
+    this process's cache settings, including --no-cache, and their spans travel back
+    with each result into this process's trace.
+
+    Args:
+        function: Module-level callable (or functools.partial of one), so it can be pickled.
+        items: Argument tuples, one per call.
+        jobs: Maximum number of worker processes.
+        start: Optional module-level callable run once in every worker, e.g. to start a PHP worker.
+    """
+    jobs = max(1, min(jobs, len(items)))
+    if jobs == 1:
+        for item in items:
+            yield function(*item)
+        return
+
+    cache = get_cache()
+    cache_args = (True, cache.cache_dir, cache.max_bytes) if cache else (False,)
+    chunksize = max(1, len(items) // (jobs * 4))
+    columns = list(zip(*items))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(cache_args, start)) as executor:
+        if not tracing_enabled():
+            yield from executor.map(function, *columns, chunksize=chunksize)
+            return
+        for result, events in executor.map(functools.partial(run_traced, function), *columns, chunksize=chunksize):
+            add_events(events)
+            yield result